@@ -0,0 +1,16 @@
+import pytest
+from yatube.queries import inspect_queries
+
+
+@pytest.fixture
+def query_inspector():
+    """Все запросы теста, сгруппированные по форме."""
+    with inspect_queries() as inspector:
+        yield inspector
+
+
+@pytest.fixture
+def no_n_plus_one(query_inspector):
+    """Тест падает, если одна форма запроса повторилась NPLUSONE_THRESHOLD раз."""
+    yield query_inspector
+    query_inspector.assert_no_repeats()
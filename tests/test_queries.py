@@ -0,0 +1,30 @@
+import pytest
+
+
+class TestNoNPlusOne:
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize('url', [
+        '/',
+        '/group/test-link/',
+        '/TestUser/',
+        '/api/v1/posts/',
+    ])
+    def test_feeds(self, client, few_posts_with_group, url, query_inspector):
+        response = client.get(url)
+        assert response.status_code == 200, f'Страница `{url}` не открывается'
+        query_inspector.assert_no_repeats()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_post_view(self, user_client, few_posts_with_group, no_n_plus_one):
+        post = few_posts_with_group
+        response = user_client.get(f'/{post.author.username}/{post.pk}/')
+        assert response.status_code == 200, 'Страница поста не открывается'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_detects_repeats(self, few_posts_with_group, query_inspector):
+        from posts.models import Post
+        for post in Post.objects.all():
+            post.author.username
+        with pytest.raises(AssertionError, match='20x SELECT'):
+            query_inspector.assert_no_repeats()
@@ -0,0 +1,232 @@
+"""
+JSON API только для чтения (api/v1/).
+
+Ответы собираются из строк values(), без моделей и шаблонов.
+?fields=id,text выбирает поля, ?cursor= листает keyset-курсором,
+?limit= задаёт размер страницы. На каждый ответ есть ETag: ленты
+кэшируются для анонимов как HTML-страницы, пост и профиль проверяют
+свежесть одним запросом до выборки.
+"""
+from functools import wraps
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, set_response_etag
+from django.views.decorators.http import condition, require_safe
+
+from .cache import INDEX_PAGES, cache_anonymous_page, group_pages
+from .freshness import (post_etag, post_last_modified, post_state,
+                        profile_etag, profile_last_modified, profile_state)
+from .models import Comment, Group, Post, User
+from .paginators import (COMMENT_ORDERING, FEED_ORDERING, POSTS_PER_PAGE,
+                         CursorPaginator)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+MAX_LIMIT = 100
+
+
+def _file_url(field):
+    storage = Post._meta.get_field(field).storage
+
+    def url(name):
+        return storage.url(name) if name else None
+    return url
+
+
+# Имя поля в API -> путь для values() и, если нужно, преобразование
+POST_FIELDS = {
+    'id': ('id', None),
+    'text': ('text', None),
+    'pub_date': ('pub_date', None),
+    'updated': ('updated', None),
+    'author': ('author__username', None),
+    'group': ('group__slug', None),
+    'image': ('image', _file_url('image')),
+    'thumbnail': ('thumbnail', _file_url('thumbnail')),
+    'comment_count': ('comment_count', None),
+    'last_comment_at': ('last_comment_at', None),
+}
+COMMENT_FIELDS = {
+    'id': ('id', None),
+    'author': ('author__username', None),
+    'text': ('text', None),
+    'created': ('created', None),
+}
+GROUP_FIELDS = {
+    'slug': ('slug', None),
+    'title': ('title', None),
+    'description': ('description', None),
+}
+USER_FIELDS = {
+    'username': ('username', None),
+    'first_name': ('first_name', None),
+    'last_name': ('last_name', None),
+    'followers': ('counters__followers', None),
+    'following': ('counters__following', None),
+    'posts': ('counters__posts', None),
+}
+
+
+class BadRequest(Exception):
+    pass
+
+
+# Формат ответа не зависит от того, установлен ли orjson: даты и время
+# он передаёт тому же DjangoJSONEncoder (миллисекунды, Z для UTC), а
+# json.dumps пишет так же компактно, как orjson
+_encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def _dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data, default=_encoder.default,
+                            option=orjson.OPT_PASSTHROUGH_DATETIME)
+    return _encoder.encode(data).encode()
+
+
+def _json_response(data, status=200):
+    return HttpResponse(_dumps(data), status=status,
+                        content_type='application/json')
+
+
+def _selected(request, fields):
+    """Поля из ?fields= в виде [(имя, путь, преобразование)]."""
+    names = [name for name in request.GET.get('fields', '').split(',')
+             if name]
+    unknown = set(names) - set(fields)
+    if unknown:
+        raise BadRequest(f'Неизвестные поля: {", ".join(sorted(unknown))}')
+    return [(name, *fields[name]) for name in names or fields]
+
+
+def _serialize(rows, selected):
+    return [
+        {name: convert(row[path]) if convert else row[path]
+         for name, path, convert in selected}
+        for row in rows
+    ]
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get('limit', POSTS_PER_PAGE))
+    except ValueError:
+        raise BadRequest('limit должен быть числом')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _list(request, queryset, fields, ordering):
+    selected = _selected(request, fields)
+    # Ключи сортировки нужны курсору, даже если их не просили
+    paths = {path for _, path, _ in selected}
+    paths.update(name.lstrip('-') for name in ordering)
+    paginator = CursorPaginator(queryset.values(*paths), _limit(request),
+                                ordering)
+    page = paginator.page(request.GET.get('cursor'))
+    return _json_response({
+        'results': _serialize(page, selected),
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+
+def api_view(view):
+    """GET/HEAD и ошибки запроса в виде JSON."""
+    @require_safe
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except BadRequest as error:
+            return _json_response({'error': str(error)}, status=400)
+        except Http404:
+            return _json_response({'error': 'Не найдено'}, status=404)
+    return wrapper
+
+
+def body_etag(view):
+    """
+    ETag по телу ответа для view без дешёвой проверки свежести:
+    запрос к базе остаётся, но неизменившийся ответ не качается заново.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if response.status_code != 200 or response.has_header('ETag'):
+            return response
+        set_response_etag(response)
+        return get_conditional_response(request, etag=response['ETag'],
+                                        response=response)
+    return wrapper
+
+
+def _posts():
+    return Post.objects.order_by()
+
+
+@api_view
+@body_etag
+@cache_anonymous_page(INDEX_PAGES)
+def posts(request):
+    return _list(request, _posts(), POST_FIELDS, FEED_ORDERING)
+
+
+@api_view
+@body_etag
+def groups(request):
+    return _list(request, Group.objects.all(), GROUP_FIELDS, ('slug',))
+
+
+@api_view
+@body_etag
+@cache_anonymous_page(group_pages)
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only('id'), slug=slug)
+    return _list(request, _posts().filter(group=group), POST_FIELDS,
+                 FEED_ORDERING)
+
+
+@api_view
+@condition(etag_func=profile_etag, last_modified_func=profile_last_modified)
+def user(request, username):
+    selected = _selected(request, USER_FIELDS)
+    row = User.objects.filter(username=username).values(
+        *{path for _, path, _ in selected}).first()
+    if row is None:
+        raise Http404
+    return _json_response(_serialize([row], selected)[0])
+
+
+@api_view
+@condition(etag_func=profile_etag, last_modified_func=profile_last_modified)
+def user_posts(request, username):
+    # Пользователь уже найден при проверке свежести
+    if profile_state(request, username) is None:
+        raise Http404
+    return _list(request, _posts().filter(author__username=username),
+                 POST_FIELDS, FEED_ORDERING)
+
+
+@api_view
+@condition(etag_func=post_etag, last_modified_func=post_last_modified)
+def post(request, username, post_id):
+    selected = _selected(request, POST_FIELDS)
+    row = _posts().filter(pk=post_id, author__username=username).values(
+        *{path for _, path, _ in selected}).first()
+    if row is None:
+        raise Http404
+    return _json_response(_serialize([row], selected)[0])
+
+
+@api_view
+@condition(etag_func=post_etag, last_modified_func=post_last_modified)
+def post_comments(request, username, post_id):
+    if post_state(request, username, post_id) is None:
+        raise Http404
+    comments = Comment.objects.filter(post_id=post_id).order_by()
+    return _list(request, comments, COMMENT_FIELDS, COMMENT_ORDERING)
@@ -1,5 +1,18 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def ensure_search_index(using, **kwargs):
+    from django.db import connections
+
+    from .search import install_search_index
+    install_search_index(connections[using])
 
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        # Пересборка posts_post в миграциях SQLite теряет триггеры поиска
+        post_migrate.connect(ensure_search_index, sender=self)
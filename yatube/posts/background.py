@@ -0,0 +1,50 @@
+"""
+Фоновые задачи после коммита: миниатюры картинок (posts/thumbnails.py)
+и раскладка новых постов по лентам подписчиков (posts/timeline.py).
+
+У каждого вида задач свой пул потоков, размер берётся из настроек;
+0 потоков - выполнять сразу после коммита в потоке запроса.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executors = {}
+_executors_lock = Lock()
+
+
+def get_executor(name, workers):
+    with _executors_lock:
+        if name not in _executors:
+            _executors[name] = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix=name,
+            )
+        return _executors[name]
+
+
+def _run_in_worker(name, func, args):
+    # У потока пула своё соединение с БД, следим за ним как обработчик
+    # запросов: закрываем протухшее до и после задачи
+    close_old_connections()
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Background task %s%r failed', name, args)
+    finally:
+        close_old_connections()
+
+
+def after_commit(name, workers, func, *args):
+    """Выполняет func(*args) после коммита текущей транзакции."""
+    def submit():
+        if workers:
+            get_executor(name, workers).submit(_run_in_worker, name, func,
+                                               args)
+        else:
+            func(*args)
+
+    transaction.on_commit(submit)
@@ -0,0 +1,115 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.utils.cache import (get_conditional_response,
+                                patch_vary_headers, set_response_etag)
+from django.utils.http import http_date, parse_http_date_safe
+
+POST_CARD_FRAGMENT = 'post_card'
+
+PAGE_CACHE_TIMEOUT = 60 * 5
+INDEX_PAGES = 'index'
+USERS_PAGES = 'users'
+
+ANONYMOUS = 'anonymous'
+AUTHENTICATED = 'authenticated'
+AUTHOR = 'author'
+ROLES = (ANONYMOUS, AUTHENTICATED, AUTHOR)
+
+
+def viewer_role(post, user):
+    """Роль зрителя определяет, какие кнопки есть в карточке поста."""
+    if not user.is_authenticated:
+        return ANONYMOUS
+    if post.author_id == user.pk:
+        return AUTHOR
+    return AUTHENTICATED
+
+
+def post_card_keys(post_id, version):
+    return [
+        make_template_fragment_key(POST_CARD_FRAGMENT,
+                                   [post_id, version, role])
+        for role in ROLES
+    ]
+
+
+def invalidate_post_card(post_id, version):
+    # Ключ и так меняется вместе с версией, удаляем старые записи,
+    # чтобы не держать в кэше заведомо мёртвые карточки
+    cache.delete_many(post_card_keys(post_id, version))
+
+
+def group_pages(slug):
+    return f'group:{slug}'
+
+
+def _version_key(namespace):
+    return f'pages:{namespace}:version'
+
+
+def pages_version(namespace):
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        # Начинаем со времени, а не с 1: если счётчик вытеснили из кэша,
+        # новые версии не совпадут со старыми записями
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_pages(*namespaces):
+    """
+    Сбрасывает все закэшированные страницы пространства имён разом:
+    меняем версию, и старые ключи больше никто не читает.
+    """
+    for namespace in namespaces:
+        try:
+            cache.incr(_version_key(namespace))
+        except ValueError:
+            pass
+
+
+def cache_anonymous_page(namespace, timeout=PAGE_CACHE_TIMEOUT):
+    """
+    Кэширует ответ view целиком для анонимных GET-запросов.
+    namespace - пространство имён для сброса кэша: строка или функция
+    от именованных аргументов view.
+    Ответ отдаётся с ETag и Last-Modified, на совпавшие валидаторы
+    отвечаем 304.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD')
+                    or request.user.is_authenticated):
+                return view(request, *args, **kwargs)
+            page_namespace = (namespace(**kwargs) if callable(namespace)
+                              else namespace)
+            path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            key = (f'page:{page_namespace}:'
+                   f'{pages_version(page_namespace)}:{path}')
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200 or response.streaming:
+                    return response
+                if hasattr(response, 'render'):
+                    response.render()
+                set_response_etag(response)
+                response['Last-Modified'] = http_date()
+                patch_vary_headers(response, ('Cookie',))
+                cache.set(key, response, timeout)
+            return get_conditional_response(
+                request,
+                etag=response['ETag'],
+                last_modified=parse_http_date_safe(
+                    response['Last-Modified']),
+                response=response,
+            )
+        return wrapper
+    return decorator
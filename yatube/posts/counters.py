@@ -0,0 +1,177 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Counter, Follow, Post, User, UserCounters
+
+ALL_POSTS_KEY = 'posts'
+
+
+def group_posts_key(group_id):
+    return f'posts:group:{group_id}'
+
+
+def get_count(key, queryset):
+    """
+    Читает счётчик. Если его ещё нет (старые данные), один раз считает
+    COUNT(*) по queryset и сохраняет результат.
+
+    Счётчик меняют сигналы, поэтому записи, изменённые в обход них
+    (bulk_create, update, правка в SQL), сдвигают его на разницу.
+    FeedPaginator, заметив расхождение на странице, делает delete(key):
+    счётчик пересчитывается по таблице при следующем чтении.
+    """
+    value = Counter.objects.filter(key=key).values_list(
+        'value', flat=True).first()
+    if value is not None:
+        return value
+    value = queryset.count()
+    try:
+        with transaction.atomic():
+            Counter.objects.create(key=key, value=value)
+    except IntegrityError:
+        # Счётчик успел создать параллельный запрос
+        pass
+    return value
+
+
+def increment(key, delta, queryset):
+    """
+    Атомарно меняет счётчик на delta. Вызывается в транзакции изменения,
+    поэтому если счётчика нет, queryset.count() уже учитывает изменение.
+    """
+    updated = Counter.objects.filter(key=key).update(value=F('value') + delta)
+    if not updated:
+        Counter.objects.get_or_create(
+            key=key, defaults={'value': queryset.count()}
+        )
+
+
+def delete(*keys):
+    Counter.objects.filter(key__in=keys).delete()
+
+
+def comment_added(comment):
+    Post.objects.filter(pk=comment.post_id).update(
+        comment_count=F('comment_count') + 1,
+        last_comment_at=comment.created,
+    )
+
+
+def comment_deleted(comment):
+    remaining = Comment.objects.filter(post=OuterRef('pk')).order_by()
+    Post.objects.filter(pk=comment.post_id).update(
+        # После расхождения счётчик не уходит ниже нуля (CHECK в PostgreSQL)
+        comment_count=Greatest(F('comment_count') - 1, 0),
+        last_comment_at=Subquery(
+            remaining.values('post').annotate(last=Max('created'))
+            .values('last')
+        ),
+    )
+
+
+def rebuild_comment_stats(posts):
+    """
+    Приводит comment_count и last_comment_at постов из posts к таблице
+    комментариев одним UPDATE, трогая только разошедшиеся. Возвращает
+    [(author_id, group_id)] исправленных постов.
+    """
+    comments = (
+        Comment.objects.filter(post=OuterRef('pk')).order_by()
+        .values('post')
+    )
+    real = {
+        'comment_count': Coalesce(
+            Subquery(comments.annotate(total=Count('id')).values('total')),
+            0
+        ),
+        'last_comment_at': Subquery(
+            comments.annotate(last=Max('created')).values('last')
+        ),
+    }
+    drifted = posts.annotate(
+        real_count=real['comment_count'], real_last=real['last_comment_at'],
+    ).filter(
+        # Сравнение с NULL в SQL не истинно и не ложно, поэтому
+        # расхождение с пустым значением проверяем отдельно
+        ~Q(comment_count=F('real_count'))
+        | Q(last_comment_at__lt=F('real_last'))
+        | Q(last_comment_at__gt=F('real_last'))
+        | Q(last_comment_at__isnull=True, real_last__isnull=False)
+        | Q(last_comment_at__isnull=False, real_last__isnull=True)
+    )
+    changed = list(drifted.values_list('pk', 'author_id', 'group_id'))
+    Post.objects.filter(pk__in=[pk for pk, _, _ in changed]).update(**real)
+    return [(author_id, group_id) for _, author_id, group_id in changed]
+
+
+def count_subquery(queryset, field):
+    """COUNT(*) по queryset для каждой внешней строки, 0 вместо NULL."""
+    return Coalesce(Subquery(
+        queryset.order_by().values(field).annotate(
+            total=Count('pk')).values('total')
+    ), 0)
+
+
+def user_counts(user):
+    """Выражения настоящих значений UserCounters для пользователя user."""
+    return {
+        'followers': count_subquery(Follow.objects.filter(author=user),
+                                    'author'),
+        'following': count_subquery(Follow.objects.filter(user=user), 'user'),
+        'posts': count_subquery(Post.objects.filter(author=user), 'author'),
+    }
+
+
+def user_counters(user):
+    """
+    Счётчики пользователя, загруженного с select_related('counters').
+    Если строки ещё нет, создаёт её по таблицам.
+    """
+    try:
+        return user.counters
+    except UserCounters.DoesNotExist:
+        pass
+    values = User.objects.filter(pk=user.pk).annotate(
+        **{f'real_{name}': value
+           for name, value in user_counts(OuterRef('pk')).items()}
+    ).values('real_followers', 'real_following', 'real_posts').get()
+    stats, _ = UserCounters.objects.get_or_create(user=user, defaults={
+        name[len('real_'):]: value for name, value in values.items()
+    })
+    user.counters = stats
+    return stats
+
+
+def increment_user(user_id, posts_changed=None, **deltas):
+    """
+    Атомарно сдвигает счётчики пользователя, например posts=1, и, если
+    передано, ставит posts_changed. Недостающую строку не создаёт: её
+    досчитает user_counters при чтении (а при каскадном удалении
+    пользователя она и не нужна).
+    """
+    values = {name: F(name) + delta for name, delta in deltas.items()}
+    if posts_changed is not None:
+        values['posts_changed'] = posts_changed
+    UserCounters.objects.filter(user_id=user_id).update(**values)
+
+
+def rebuild_user_counters(users):
+    """
+    Приводит счётчики пользователей из users к таблицам: создаёт
+    недостающие строки и правит разошедшиеся одним UPDATE.
+    Возвращает число исправленных строк.
+    """
+    missing = users.filter(counters__isnull=True).values_list('pk',
+                                                              flat=True)
+    UserCounters.objects.bulk_create(
+        [UserCounters(user_id=pk) for pk in missing], ignore_conflicts=True
+    )
+    real = user_counts(OuterRef('pk'))
+    drifted = UserCounters.objects.filter(user__in=users).annotate(
+        **{f'real_{name}': value for name, value in real.items()}
+    ).exclude(followers=F('real_followers'), following=F('real_following'),
+              posts=F('real_posts'))
+    return UserCounters.objects.filter(
+        pk__in=drifted.values('pk')
+    ).update(**real)
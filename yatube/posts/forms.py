@@ -1,11 +1,13 @@
 from django import forms
 from .models import Comment, Post
+from .uploads import BoundedImageField
 
 
 class PostForm(forms.ModelForm):
     class Meta:
         model = Post
         fields = ["text", "group", "image"]
+        field_classes = {"image": BoundedImageField}
         help_texts = {
             "text": "Здесь должен быть текст поста",
             "group": "А здесь можно выбрать группу для опубликования",
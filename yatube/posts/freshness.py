@@ -0,0 +1,102 @@
+import hashlib
+from functools import wraps
+
+from django.db.models import Exists, F, OuterRef
+
+from .models import Follow, Post, User
+
+
+def _latest(*moments):
+    moments = [moment for moment in moments if moment is not None]
+    return max(moments) if moments else None
+
+
+def _etag(request, *parts):
+    # Страница зависит от зрителя (навигация, кнопки, форма комментария).
+    # В формах - CSRF-токен: после входа он другой, и страница из кэша
+    # браузера со старым токеном дала бы 403 на следующий POST
+    viewer = request.user.pk if request.user.is_authenticated else 0
+    csrf = request.META.get('CSRF_COOKIE', '')
+    raw = ':'.join(str(part) for part in (viewer, csrf, *parts))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _memoize(name):
+    # condition() зовёт etag_func и last_modified_func по отдельности,
+    # а запрос за состоянием нужен один
+    def decorator(func):
+        @wraps(func)
+        def wrapper(request, *args, **kwargs):
+            attr = f'_freshness_{name}'
+            if not hasattr(request, attr):
+                setattr(request, attr, func(request, *args, **kwargs))
+            return getattr(request, attr)
+        return wrapper
+    return decorator
+
+
+def _is_following(request, author):
+    return Exists(Follow.objects.filter(user_id=request.user.pk,
+                                        author=author))
+
+
+@_memoize('post')
+def post_state(request, username, post_id):
+    # Счётчики карточки автора приходят тем же запросом через JOIN
+    return Post.objects.filter(
+        pk=post_id, author__username=username
+    ).annotate(
+        is_following=_is_following(request, OuterRef('author_id')),
+    ).values('updated', 'last_comment_at', 'comment_count',
+             'is_following', 'author__first_name', 'author__last_name',
+             post_count=F('author__counters__posts'),
+             follower_count=F('author__counters__followers'),
+             following_count=F('author__counters__following')).first()
+
+
+def post_etag(request, username, post_id):
+    state = post_state(request, username, post_id)
+    if state is None:
+        return None
+    return _etag(request, state['updated'].timestamp(),
+                 state['author__first_name'], state['author__last_name'],
+                 state['last_comment_at'], state['comment_count'],
+                 state['post_count'], state['follower_count'],
+                 state['following_count'], state['is_following'])
+
+
+def post_last_modified(request, username, post_id):
+    state = post_state(request, username, post_id)
+    if state is None:
+        return None
+    return _latest(state['updated'], state['last_comment_at'])
+
+
+@_memoize('profile')
+def profile_state(request, username):
+    # Версия постов автора лежит в счётчиках: ни агрегатов, ни
+    # просмотра всех его постов ради ETag
+    return User.objects.filter(username=username).annotate(
+        is_following=_is_following(request, OuterRef('pk')),
+    ).values('is_following', 'first_name', 'last_name',
+             total=F('counters__posts'),
+             posts_changed=F('counters__posts_changed'),
+             follower_count=F('counters__followers'),
+             following_count=F('counters__following')).first()
+
+
+def profile_etag(request, username):
+    state = profile_state(request, username)
+    if state is None:
+        return None
+    return _etag(request, state['first_name'], state['last_name'],
+                 state['posts_changed'], state['total'],
+                 state['follower_count'], state['following_count'],
+                 state['is_following'])
+
+
+def profile_last_modified(request, username):
+    state = profile_state(request, username)
+    if state is None:
+        return None
+    return state['posts_changed']
@@ -0,0 +1,157 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+
+import django
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, F
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post, User
+
+VIEWS = ("index", "group_posts", "profile", "post", "new_post",
+         "add_comment")
+
+
+def percentile(values, fraction):
+    """Процентиль по ближайшему рангу, values отсортированы."""
+    index = max(0, min(len(values) - 1,
+                       round(fraction * len(values) + 0.5) - 1))
+    return values[index]
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def targets():
+    """
+    Самые тяжёлые адреса на текущих данных: крупнейшая группа, самый
+    пишущий автор, пост с наибольшим числом комментариев.
+    """
+    group = Group.objects.annotate(total=Count("posts")).order_by(
+        "-total").first()
+    author = User.objects.order_by(
+        F("counters__posts").desc(nulls_last=True)).first()
+    post = Post.objects.select_related("author").order_by(
+        "-comment_count").first()
+    if group is None or author is None or post is None:
+        raise CommandError("Нет данных, сначала запустите seed_data")
+    post_args = [post.author.username, post.pk]
+    return {
+        "index": ("get", reverse("index"), {}),
+        "group_posts": ("get", reverse("group_posts", args=[group.slug]), {}),
+        "profile": ("get", reverse("profile", args=[author.username]), {}),
+        "post": ("get", reverse("post", args=post_args), {}),
+        "new_post": ("post", reverse("new_post"), {"text": "benchmark"}),
+        "add_comment": ("post", reverse("add_comment", args=post_args),
+                        {"text": "benchmark"}),
+    }, author
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет задержку (p50/p95/p99) и число SQL-запросов для страниц "
+        "posts на текущих данных (см. seed_data) и пишет результат в JSON "
+        "для сравнения между коммитами. Записи выполняются в транзакции, "
+        "которая откатывается, и данные не меняются"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--views", nargs="+", choices=VIEWS,
+                            default=list(VIEWS))
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument("--warmup", type=int, default=10)
+        parser.add_argument(
+            "--anonymous", action="store_true",
+            help="Читать страницы гостем (с кэшем страниц), а не "
+                 "залогиненным пользователем; записи пропускаются",
+        )
+        parser.add_argument(
+            "--cold", action="store_true",
+            help="Очищать кэш перед каждым запросом",
+        )
+        parser.add_argument("--output", help="Файл для JSON, иначе stdout")
+
+    def handle(self, *args, **options):
+        urls, author = targets()
+        client = Client()
+        if not options["anonymous"]:
+            client.force_login(author)
+        results = {}
+        for name in options["views"]:
+            method, url, data = urls[name]
+            if method == "post" and options["anonymous"]:
+                continue
+            self.stderr.write(f"{name}: {url}")
+            results[name] = self.measure(client, method, url, data, options)
+        report = {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "anonymous": options["anonymous"],
+            "cold_cache": options["cold"],
+            "dataset": {
+                "users": User.objects.count(),
+                "groups": Group.objects.count(),
+                "posts": Post.objects.count(),
+                "comments": Comment.objects.count(),
+            },
+            "results": results,
+        }
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as stream:
+                stream.write(output + "\n")
+        else:
+            self.stdout.write(output)
+
+    def request(self, client, method, url, data, options):
+        if options["cold"]:
+            cache.clear()
+        if method == "get":
+            return client.get(url)
+        # Запись меряем вместе с сигналами, но не оставляем в базе
+        with transaction.atomic():
+            response = client.post(url, data)
+            transaction.set_rollback(True)
+        return response
+
+    def measure(self, client, method, url, data, options):
+        for _ in range(options["warmup"]):
+            self.request(client, method, url, data, options)
+        latencies = []
+        queries = []
+        errors = 0
+        for _ in range(options["iterations"]):
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = self.request(client, method, url, data, options)
+                latencies.append((time.perf_counter() - started) * 1000)
+            queries.append(len(context))
+            if response.status_code >= 400:
+                errors += 1
+        latencies.sort()
+        return {
+            "url": url,
+            "iterations": len(latencies),
+            "errors": errors,
+            "p50_ms": round(percentile(latencies, 0.50), 3),
+            "p95_ms": round(percentile(latencies, 0.95), 3),
+            "p99_ms": round(percentile(latencies, 0.99), 3),
+            "mean_ms": round(statistics.mean(latencies), 3),
+            "queries": max(queries),
+        }
@@ -0,0 +1,66 @@
+import multiprocessing
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import attach_variants, render_variants
+
+
+def _render(image_name, force):
+    try:
+        return image_name, render_variants(image_name, force=force), None
+    except Exception as error:
+        return image_name, None, str(error)
+
+
+class Command(BaseCommand):
+    help = (
+        "Готовит миниатюры всех размеров и форматов для картинок постов, "
+        "у которых их нет, параллельно на всех ядрах"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=os.cpu_count(),
+            help="Число процессов, по умолчанию по числу ядер",
+        )
+        parser.add_argument(
+            "--force", action="store_true",
+            help="Пересоздать и уже готовые миниатюры",
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image="").exclude(image__isnull=True)
+        if not options["force"]:
+            posts = posts.filter(variants="")
+        # Одинаковые картинки хранятся одним файлом, режем их один раз
+        jobs = defaultdict(list)
+        for post_id, image_name in posts.order_by("pk").values_list(
+                "pk", "image"):
+            jobs[image_name].append(post_id)
+        if not jobs:
+            self.stdout.write("Все миниатюры уже готовы")
+            return
+        # Процессы-воркеры форкаются с уже настроенным Django и в БД
+        # не ходят: картинки режут они, а сохраняет ссылки родитель
+        context = multiprocessing.get_context("fork")
+        done = failed = 0
+        with ProcessPoolExecutor(max_workers=options["workers"],
+                                 mp_context=context) as executor:
+            futures = [executor.submit(_render, image_name, options["force"])
+                       for image_name in jobs]
+            for future in as_completed(futures):
+                image_name, variants, error = future.result()
+                if error is not None:
+                    failed += len(jobs[image_name])
+                    self.stderr.write(f"{image_name}: {error}")
+                    continue
+                for post_id in jobs[image_name]:
+                    if attach_variants(post_id, image_name, variants):
+                        done += 1
+        self.stdout.write(self.style.SUCCESS(
+            f"Миниатюр готово: {done}, ошибок: {failed}"
+        ))
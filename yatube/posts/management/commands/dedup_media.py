@@ -0,0 +1,94 @@
+import json
+import re
+
+from django.core.files import File
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models.functions import Now
+
+from posts.cache import INDEX_PAGES, group_pages, invalidate_pages
+from posts.models import Group, Post
+from posts.storage import content_hash, content_name
+
+CONTENT_NAME = re.compile(r"/[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$")
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит картинки постов в хранилище с адресацией по содержимому: "
+        "одинаковые файлы сливаются в один, лишние копии удаляются"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Только посчитать, сколько места освободится",
+        )
+        parser.add_argument(
+            "--no-thumbnails", action="store_true",
+            help="Не готовить миниатюры для перенесённых картинок",
+        )
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field("image").storage
+        names = (
+            Post.objects.exclude(image="").exclude(image__isnull=True)
+            .order_by().values_list("image", flat=True).distinct()
+        )
+        moved = merged = freed = 0
+        for name in list(names):
+            if CONTENT_NAME.search(name) or not storage.exists(name):
+                continue
+            with storage.open(name) as content:
+                new_name = content_name(name, content_hash(content))
+                exists = storage.exists(new_name)
+                size = content.size
+            if exists:
+                merged += 1
+                freed += size
+            else:
+                moved += 1
+            if options["dry_run"]:
+                continue
+            if not exists:
+                with storage.open(name) as content:
+                    # Хранилище само выведет то же имя по содержимому
+                    new_name = storage.save(name, File(content, name))
+            self.relink(storage, name, new_name)
+        if not options["dry_run"] and (moved or merged):
+            # update() мимо сигналов: кэш страниц сбрасываем сами
+            invalidate_pages(INDEX_PAGES, *(
+                group_pages(slug)
+                for slug in Group.objects.values_list("slug", flat=True)
+            ))
+            if not options["no_thumbnails"]:
+                call_command("build_thumbnails", stdout=self.stdout,
+                             stderr=self.stderr)
+        verb = "Будет" if options["dry_run"] else "Готово"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb}: перенесено {moved}, слито с копиями {merged}, "
+            f"освобождено {freed} байт"
+        ))
+
+    def relink(self, storage, name, new_name):
+        posts = Post.objects.filter(image=name)
+        old_files = {name}
+        for thumbnail, variants in posts.values_list("thumbnail",
+                                                     "variants"):
+            old_files.add(thumbnail)
+            for widths in (json.loads(variants) if variants else {}).values():
+                old_files.update(widths.values())
+        old_files.discard("")
+        old_files.discard(None)
+        with transaction.atomic():
+            # Миниатюры называются по имени картинки, их пересоздаст
+            # build_thumbnails; updated сдвигаем ради версии карточки
+            posts.update(image=new_name, thumbnail="", variants="",
+                         updated=Now())
+
+            def delete_old_files():
+                for old in old_files:
+                    storage.delete(old)
+
+            transaction.on_commit(delete_old_files)
@@ -0,0 +1,80 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from posts.models import Comment, Post
+from posts.paginators import (FEED_ORDERING, POSTS_PER_PAGE, beyond,
+                              reversed_ordering)
+
+
+def feed_queries(author_id, group_id, post_id):
+    """Запросы страниц в том виде, в каком их строят view-функции."""
+    limit = POSTS_PER_PAGE + 1
+    cursor = [timezone.now(), 1]
+    feeds = {
+        "index": Post.objects.for_feed(),
+        "group_posts": Post.objects.for_feed().filter(group_id=group_id),
+        "profile": Post.objects.for_feed().filter(author_id=author_id),
+    }
+    queries = {}
+    for name, feed in feeds.items():
+        queries[f"{name} ?page=N"] = (
+            feed.order_by(*FEED_ORDERING)[POSTS_PER_PAGE:POSTS_PER_PAGE * 2]
+        )
+        queries[f"{name} ?cursor= next"] = (
+            feed.filter(beyond(FEED_ORDERING, cursor))
+            .order_by(*FEED_ORDERING)[:limit]
+        )
+        reverse_ordering = reversed_ordering(FEED_ORDERING)
+        queries[f"{name} ?cursor= previous"] = (
+            feed.filter(beyond(reverse_ordering, cursor))
+            .order_by(*reverse_ordering)[:limit]
+        )
+    queries["post_view comments"] = (
+        Comment.objects.filter(post_id=post_id).select_related("author")
+    )
+    return queries
+
+
+def problems(plan):
+    """Шаги плана, на которых SQLite сортирует или читает всю таблицу."""
+    bad = []
+    for detail in plan:
+        if "TEMP B-TREE" in detail:
+            bad.append(detail)
+        elif detail.startswith("SCAN") and "USING" not in detail:
+            bad.append(detail)
+    return bad
+
+
+class Command(BaseCommand):
+    help = (
+        "Выполняет EXPLAIN QUERY PLAN для запросов лент и проверяет, "
+        "что они идут по индексам без сортировки во временном B-дереве"
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("Проверка планов написана для SQLite")
+        sample = Post.objects.order_by().values(
+            "pk", "author_id", "group_id").first() or {}
+        queries = feed_queries(
+            author_id=sample.get("author_id") or 1,
+            group_id=sample.get("group_id") or 1,
+            post_id=sample.get("pk") or 1,
+        )
+        failed = []
+        for name, queryset in queries.items():
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+                plan = [row[-1] for row in cursor.fetchall()]
+            bad = problems(plan)
+            style = self.style.ERROR if bad else self.style.SUCCESS
+            self.stdout.write(style(f"{'FAIL' if bad else 'OK'}  {name}"))
+            for detail in plan:
+                self.stdout.write(f"      {detail}")
+            if bad:
+                failed.append(name)
+        if failed:
+            raise CommandError(f"Без индекса: {', '.join(failed)}")
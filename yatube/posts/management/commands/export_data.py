@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from posts.dataio import (DATASETS, FORMATS, detect_format, export_rows,
+                          write_rows)
+
+
+class Command(BaseCommand):
+    help = (
+        "Выгружает пользователей, группы, посты или комментарии в JSON Lines "
+        "или CSV, читая таблицу потоком через iterator()"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", choices=list(DATASETS))
+        parser.add_argument("path", help="Файл или - для stdout")
+        parser.add_argument("--format", choices=FORMATS,
+                            help="По умолчанию - по расширению файла")
+        parser.add_argument(
+            "--chunk-size", type=int, default=2000,
+            help="Сколько строк читать из базы за раз",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = detect_format(path, options["format"] or (
+            "jsonl" if path == "-" else None))
+        rows = export_rows(options["dataset"], options["chunk_size"])
+        if path == "-":
+            for _ in write_rows(self.stdout, fmt, options["dataset"], rows):
+                pass
+            return
+        written = 0
+        with open(path, "w", encoding="utf-8", newline="") as stream:
+            for written in write_rows(stream, fmt, options["dataset"], rows):
+                if written % 10000 == 0:
+                    self.stderr.write(f"{written}", ending="\r")
+        self.stderr.write(self.style.SUCCESS(
+            f"Выгружено {options['dataset']}: {written}"
+        ))
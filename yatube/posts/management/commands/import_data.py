@@ -0,0 +1,88 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from posts.dataio import (DATASETS, FORMATS, batches, build_objects,
+                          detect_format, keep_dates, make_lookups,
+                          read_rows, rebuild_derived)
+
+
+class Command(BaseCommand):
+    help = (
+        "Загружает пользователей, группы, посты или комментарии из JSON "
+        "Lines или CSV пачками bulk_create, по транзакции на пачку. "
+        "Сигналы при этом не срабатывают, поэтому в конце пересчитываются "
+        "счётчики и сбрасывается кэш страниц"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", choices=list(DATASETS))
+        parser.add_argument("path", help="Файл или - для stdin")
+        parser.add_argument("--format", choices=FORMATS,
+                            help="По умолчанию - по расширению файла")
+        parser.add_argument(
+            "--batch-size", type=int, default=2000,
+            help="Сколько строк вставлять в одной транзакции",
+        )
+        parser.add_argument(
+            "--ignore-conflicts", action="store_true",
+            help="Пропускать строки, которые уже есть в базе (повторный "
+                 "запуск после обрыва)",
+        )
+        parser.add_argument(
+            "--no-recount", action="store_true",
+            help="Не пересчитывать счётчики после загрузки (если дальше "
+                 "грузится ещё один файл)",
+        )
+
+    def handle(self, *args, **options):
+        dataset = options["dataset"]
+        path = options["path"]
+        fmt = detect_format(path, options["format"] or (
+            "jsonl" if path == "-" else None))
+        model = DATASETS[dataset][0]
+        lookups = make_lookups(dataset)
+        if path == "-":
+            stream = sys.stdin
+        else:
+            stream = open(path, encoding="utf-8", newline="")
+        created = skipped = 0
+        started = time.monotonic()
+        try:
+            with keep_dates(model):
+                for batch in batches(read_rows(stream, fmt),
+                                     options["batch_size"]):
+                    with transaction.atomic():
+                        objects, missing = build_objects(dataset, batch,
+                                                         lookups)
+                        model.objects.bulk_create(
+                            objects,
+                            ignore_conflicts=options["ignore_conflicts"],
+                        )
+                    created += len(objects)
+                    skipped += missing
+                    rate = created / max(time.monotonic() - started, 1e-6)
+                    self.stdout.write(f"{created} ({rate:.0f}/с)",
+                                      ending="\r")
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        self.reset_sequences(model)
+        if not options["no_recount"]:
+            rebuild_derived(self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f"Загружено {dataset}: {created}, пропущено без автора или "
+            f"поста: {skipped}"
+        ))
+
+    def reset_sequences(self, model):
+        # Строки пришли со своими id: последовательность в PostgreSQL
+        # нужно догнать, как это делает loaddata
+        statements = connection.ops.sequence_reset_sql(no_style(), [model])
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
@@ -0,0 +1,98 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+from urllib.error import HTTPError, URLError
+from urllib.request import urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+
+
+def feed_urls(limit=20):
+    """Адреса read-only страниц на текущих данных."""
+    urls = [reverse("index"), reverse("user_list")]
+    for slug in Group.objects.values_list("slug", flat=True)[:limit]:
+        urls.append(reverse("group_posts", args=[slug]))
+    for username in User.objects.filter(
+            posts__isnull=False).values_list(
+            "username", flat=True).distinct()[:limit]:
+        urls.append(reverse("profile", args=[username]))
+    for post_id, username in Post.objects.values_list(
+            "pk", "author__username")[:limit]:
+        urls.append(reverse("post", args=[username, post_id]))
+    return urls
+
+
+def fetch(url, timeout):
+    started = time.perf_counter()
+    try:
+        with urlopen(url, timeout=timeout) as response:
+            response.read()
+            ok = response.status < 400
+    except HTTPError as error:
+        ok = error.code < 400
+    except (URLError, OSError):
+        ok = False
+    return time.perf_counter() - started, ok
+
+
+def run(base_url, paths, requests, concurrency, timeout):
+    urls = [base_url.rstrip("/") + path
+            for path in islice(cycle(paths), requests)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda url: fetch(url, timeout), urls))
+    elapsed = time.perf_counter() - started
+    latencies = sorted(latency for latency, _ in results)
+    return {
+        "requests": len(results),
+        "errors": sum(1 for _, ok in results if not ok),
+        "rps": len(results) / elapsed if elapsed else 0,
+        "p50": statistics.median(latencies) * 1000,
+        "p95": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагружает запущенные серверы одинаковым набором страниц лент "
+        "и сравнивает пропускную способность, например WSGI и ASGI"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "targets", nargs="+", metavar="NAME=URL",
+            help="Серверы, например wsgi=http://127.0.0.1:8000",
+        )
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--timeout", type=float, default=30)
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options["targets"]:
+            name, sep, url = target.partition("=")
+            if not sep or not url.startswith(("http://", "https://")):
+                raise CommandError(f"Ожидается NAME=URL: {target}")
+            targets.append((name, url))
+        paths = feed_urls()
+        if not paths:
+            raise CommandError("Нет данных для нагрузки")
+        self.stdout.write(
+            f"{len(paths)} страниц, {options['requests']} запросов, "
+            f"{options['concurrency']} параллельно"
+        )
+        self.stdout.write(
+            f"{'server':<10}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}"
+            f"{'errors':>10}"
+        )
+        for name, url in targets:
+            stats = run(url, paths, options["requests"],
+                        options["concurrency"], options["timeout"])
+            self.stdout.write(
+                f"{name:<10}{stats['rps']:>10.1f}{stats['p50']:>10.1f}"
+                f"{stats['p95']:>10.1f}{stats['errors']:>10}"
+            )
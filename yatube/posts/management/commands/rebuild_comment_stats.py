@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from posts.cache import INDEX_PAGES, group_pages, invalidate_pages
+from posts.counters import rebuild_comment_stats
+from posts.models import Group, Post, UserCounters
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает Post.comment_count и Post.last_comment_at "
+        "по таблице комментариев"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=10000,
+            help="Сколько постов (по диапазону id) обновлять в одной "
+                 "транзакции",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        last_id = Post.objects.aggregate(last=Max("pk"))["last"] or 0
+        updated = 0
+        for start in range(0, last_id, batch_size):
+            with transaction.atomic():
+                changed = rebuild_comment_stats(
+                    Post.objects.filter(pk__gt=start,
+                                        pk__lte=start + batch_size)
+                )
+                # Сигналы тут не работают: сами сдвигаем версию постов
+                # авторов для ETag профиля
+                UserCounters.objects.filter(
+                    user_id__in={author_id for author_id, _ in changed}
+                ).update(posts_changed=timezone.now())
+            if changed:
+                # Карточки сменят версию сами, а закэшированные ленты
+                # сбрасываем после коммита
+                slugs = Group.objects.filter(
+                    pk__in={group_id for _, group_id in changed}
+                ).values_list("slug", flat=True)
+                invalidate_pages(INDEX_PAGES,
+                                 *(group_pages(slug) for slug in slugs))
+            updated += len(changed)
+            self.stdout.write(
+                f"{min(start + batch_size, last_id)}/{last_id}", ending="\r"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Обновлено постов: {updated}"))
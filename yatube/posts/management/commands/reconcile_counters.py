@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from posts.counters import rebuild_user_counters
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Сверяет счётчики подписчиков, подписок и постов пользователей "
+        "(UserCounters) с таблицами и исправляет расхождения"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=10000,
+            help="Сколько пользователей (по диапазону id) сверять в одной "
+                 "транзакции",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        last_id = User.objects.aggregate(last=Max("pk"))["last"] or 0
+        fixed = 0
+        for start in range(0, last_id, batch_size):
+            with transaction.atomic():
+                fixed += rebuild_user_counters(
+                    User.objects.filter(pk__gt=start,
+                                        pk__lte=start + batch_size)
+                )
+            self.stdout.write(
+                f"{min(start + batch_size, last_id)}/{last_id}", ending="\r"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Исправлено счётчиков: {fixed}"))
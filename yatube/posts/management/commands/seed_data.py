@@ -0,0 +1,164 @@
+import random
+import time
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from posts.dataio import keep_dates, rebuild_derived
+from posts.models import Comment, Group, Post, User
+
+SCALES = {
+    "10k": 10_000,
+    "100k": 100_000,
+    "1m": 1_000_000,
+    "10m": 10_000_000,
+}
+WORDS = (
+    "пост котик кофе утро город книга музыка джанго питон база индекс "
+    "запрос кэш лента подписка группа фото отпуск море горы дождь код "
+    "релиз тест ошибка ревью идея план неделя выходные друзья"
+).split()
+PERIOD = timedelta(days=365)
+
+
+def zipf_weights(count, exponent):
+    """Накопленные веса: первый в k раз популярнее k-го."""
+    return list(accumulate(1 / rank ** exponent
+                           for rank in range(1, count + 1)))
+
+
+def text(rnd, words):
+    return " ".join(rnd.choices(WORDS, k=words))
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет базу синтетическими пользователями, группами, постами "
+        "и комментариями для замеров (см. benchmark). Авторы, группы и "
+        "число комментариев распределены неравномерно, как в жизни: "
+        "немногие авторы пишут большую часть постов"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", choices=list(SCALES), default="10k",
+                            help="Сколько постов создать")
+        parser.add_argument("--posts", type=int,
+                            help="Точное число постов вместо --scale")
+        parser.add_argument("--posts-per-user", type=int, default=100)
+        parser.add_argument("--posts-per-group", type=int, default=10_000)
+        parser.add_argument(
+            "--skew", type=float, default=1.1,
+            help="Показатель закона Ципфа для авторов и групп",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=0,
+                            help="Зерно генератора: одинаковые данные "
+                                 "от запуска к запуску")
+
+    def handle(self, *args, **options):
+        total = options["posts"] or SCALES[options["scale"]]
+        if total <= 0:
+            raise CommandError("Число постов должно быть положительным")
+        rnd = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.started = time.monotonic()
+        user_ids = self.create_users(
+            max(total // options["posts_per_user"], 10))
+        group_ids = self.create_groups(
+            max(total // options["posts_per_group"], 5))
+        self.create_posts(rnd, total, user_ids, group_ids, options["skew"])
+        rebuild_derived(self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово за {time.monotonic() - self.started:.0f} с: "
+            f"постов {Post.objects.count()}, "
+            f"комментариев {Comment.objects.count()}"
+        ))
+
+    def progress(self, label, done, total):
+        self.stdout.write(f"{label}: {done}/{total}", ending="\r")
+
+    def create_users(self, count):
+        start = User.objects.aggregate(last=Max("pk"))["last"] or 0
+        # Хэш считается один раз: входить под этими пользователями
+        # незачем, benchmark логинится через force_login
+        password = make_password(None)
+        for offset in range(0, count, self.batch_size):
+            size = min(self.batch_size, count - offset)
+            User.objects.bulk_create(
+                User(username=f"seed{start + offset + i}", password=password,
+                     first_name="Автор", last_name=str(start + offset + i))
+                for i in range(size)
+            )
+            self.progress("Пользователи", offset + size, count)
+        return list(User.objects.filter(pk__gt=start).order_by(
+            "pk").values_list("pk", flat=True))
+
+    def create_groups(self, count):
+        start = Group.objects.aggregate(last=Max("pk"))["last"] or 0
+        Group.objects.bulk_create(
+            Group(title=f"Группа {start + i}", slug=f"seed-{start + i}",
+                  description="Сгенерированная группа")
+            for i in range(count)
+        )
+        return list(Group.objects.filter(pk__gt=start).order_by(
+            "pk").values_list("pk", flat=True))
+
+    def create_posts(self, rnd, total, user_ids, group_ids, skew):
+        author_weights = zipf_weights(len(user_ids), skew)
+        group_weights = zipf_weights(len(group_ids), skew)
+        now = timezone.now()
+        created = comments = 0
+        with keep_dates(Post), keep_dates(Comment):
+            while created < total:
+                size = min(self.batch_size, total - created)
+                with transaction.atomic():
+                    last_id = Post.objects.aggregate(
+                        last=Max("pk"))["last"] or 0
+                    authors = rnd.choices(user_ids,
+                                          cum_weights=author_weights, k=size)
+                    groups = rnd.choices(group_ids,
+                                         cum_weights=group_weights, k=size)
+                    posts = []
+                    for author_id, group_id in zip(authors, groups):
+                        pub_date = now - rnd.random() * PERIOD
+                        posts.append(Post(
+                            text=text(rnd, rnd.randint(5, 60)),
+                            author_id=author_id,
+                            # Треть постов без группы
+                            group_id=group_id if rnd.random() < 0.66
+                            else None,
+                            pub_date=pub_date, updated=pub_date,
+                        ))
+                    Post.objects.bulk_create(posts)
+                    # SQLite не возвращает id из bulk_create, берём диапазон
+                    new_posts = Post.objects.filter(
+                        pk__gt=last_id).values_list("pk", "pub_date")
+                    comments += self.create_comments(
+                        rnd, new_posts, user_ids, author_weights, now)
+                created += size
+                self.progress("Посты", created, total)
+        self.stdout.write(f"Постов {created}, комментариев {comments}")
+
+    def create_comments(self, rnd, posts, user_ids, author_weights, now):
+        batch = []
+        for post_id, pub_date in posts:
+            # Парето: у большинства постов 0-1 комментарий, у редких сотни
+            count = min(int(rnd.paretovariate(1.2)) - 1, 1000)
+            if not count:
+                continue
+            authors = rnd.choices(user_ids, cum_weights=author_weights,
+                                  k=count)
+            for author_id in authors:
+                batch.append(Comment(
+                    post_id=post_id, author_id=author_id,
+                    text=text(rnd, rnd.randint(2, 20)),
+                    created=min(pub_date + rnd.random() * timedelta(days=7),
+                                now),
+                ))
+        Comment.objects.bulk_create(batch)
+        return len(batch)
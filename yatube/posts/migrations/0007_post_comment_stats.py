@@ -0,0 +1,44 @@
+# Generated by Django 2.2.28 on 2026-10-18 02:52
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_comment_stats(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    comments = (
+        Comment.objects.filter(post=OuterRef('pk')).order_by()
+        .values('post')
+    )
+    Post.objects.update(
+        comment_count=Coalesce(
+            Subquery(comments.annotate(total=Count('id')).values('total')),
+            0
+        ),
+        last_comment_at=Subquery(
+            comments.annotate(last=Max('created')).values('last')
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_counter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='last_comment_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_comment_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 03:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_post_thumbnail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='variants',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+    ]
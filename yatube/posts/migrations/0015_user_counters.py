@@ -0,0 +1,59 @@
+# Generated by Django 2.2.28 on 2026-10-18 03:14
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count(queryset, field):
+    return Coalesce(Subquery(
+        queryset.order_by().values(field).annotate(
+            total=Count('pk')).values('total')
+    ), 0)
+
+
+def fill_user_counters(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    UserCounters = apps.get_model('posts', 'UserCounters')
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    Counter = apps.get_model('posts', 'Counter')
+    users = User.objects.annotate(
+        follower_total=_count(
+            Follow.objects.filter(author=OuterRef('pk')), 'author'),
+        following_total=_count(
+            Follow.objects.filter(user=OuterRef('pk')), 'user'),
+        post_total=_count(
+            Post.objects.filter(author=OuterRef('pk')), 'author'),
+    ).values_list('pk', 'follower_total', 'following_total', 'post_total')
+    UserCounters.objects.bulk_create(
+        (UserCounters(user_id=pk, followers=followers, following=following,
+                      posts=posts)
+         for pk, followers, following, posts in users.iterator()),
+        batch_size=1000,
+    )
+    # Число постов автора теперь живёт в UserCounters
+    Counter.objects.filter(key__startswith='posts:author:').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0014_follow_timeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCounters',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('followers', models.PositiveIntegerField(default=0)),
+                ('following', models.PositiveIntegerField(default=0)),
+                ('posts', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(fill_user_counters, migrations.RunPython.noop),
+    ]
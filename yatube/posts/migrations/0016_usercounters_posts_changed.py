@@ -0,0 +1,32 @@
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+
+
+def fill_posts_changed(apps, schema_editor):
+    UserCounters = apps.get_model('posts', 'UserCounters')
+    Post = apps.get_model('posts', 'Post')
+    posts = Post.objects.filter(author=OuterRef('user')).order_by().values(
+        'author')
+    # Последняя правка поста или последний комментарий, что позже
+    for field in ('updated', 'last_comment_at'):
+        latest = Subquery(posts.annotate(last=Max(field)).values('last'))
+        UserCounters.objects.annotate(latest=latest).filter(
+            models.Q(posts_changed__isnull=True)
+            | models.Q(posts_changed__lt=models.F('latest'))
+        ).update(posts_changed=latest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usercounters',
+            name='posts_changed',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_posts_changed, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,12 @@
-from django.db import models
+import json
+import posixpath
+
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth import get_user_model
 
+from .storage import post_image_storage
+
 User = get_user_model()
 
 
@@ -13,20 +19,107 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        # Всё, что нужно карточке поста, достаём одним запросом:
+        # автора и группу через JOIN, активность комментариев лежит
+        # в самом посте (comment_count, last_comment_at)
+        return self.select_related("author", "group")
+
+
 class Post(models.Model):
     text = models.TextField()
     pub_date = models.DateTimeField("date published", auto_now_add=True)
+    updated = models.DateTimeField("date updated", auto_now=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name="posts")
     group = models.ForeignKey(Group, on_delete=models.SET_NULL,
                               related_name="posts", blank=True, null=True)
-    image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    # Одинаковые загрузки хранятся одним файлом, см. posts/storage.py
+    image = models.ImageField(upload_to='posts/', storage=post_image_storage,
+                              blank=True, null=True)
+    # Готовится в фоне после сохранения, см. posts/thumbnails.py
+    thumbnail = models.ImageField(upload_to='posts/thumbs/', blank=True,
+                                  null=True, editable=False)
+    # JSON {формат: {ширина: имя файла}} для srcset карточки
+    variants = models.TextField(blank=True, default='', editable=False)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    last_comment_at = models.DateTimeField(blank=True, null=True,
+                                           editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return self.text[:15]
 
+    @property
+    def cache_version(self):
+        # Меняется при редактировании поста и при любом изменении
+        # комментариев, по нему ключуется закэшированная карточка.
+        # Время последнего комментария отличает "добавили, удалили и
+        # снова добавили" от исходной версии с тем же числом
+        last = (self.last_comment_at.timestamp()
+                if self.last_comment_at else "")
+        return f"{self.updated.timestamp()}:{self.comment_count}:{last}"
+
+    @property
+    def image_variants(self):
+        return json.loads(self.variants) if self.variants else {}
+
+    @image_variants.setter
+    def image_variants(self, value):
+        self.variants = json.dumps(value) if value else ''
+
+    # Поля, которые пишут только сигналы и фоновые задачи точечным
+    # UPDATE. Полное сохранение их не трогает, иначе затёрло бы свежее
+    # значение копией, загруженной вместе с объектом
+    DERIVED_FIELDS = ('comment_count', 'last_comment_at', 'thumbnail',
+                      'variants')
+
+    @classmethod
+    def full_save_fields(cls):
+        return [field.name for field in cls._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in cls.DERIVED_FIELDS]
+
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        if (update_fields is None and not force_insert
+                and not self._state.adding):
+            update_fields = self.full_save_fields()
+        # Счётчики постов обновляются сигналами, держим их в одной
+        # транзакции с самим постом. Там же держится блокировка
+        # lock_media, под которой хранилище переиспользует файл
+        with transaction.atomic():
+            super().save(force_insert, force_update, using, update_fields)
+
     class Meta:
         ordering = ['-pub_date']
+        # Под ленты: фильтр по автору/группе + сортировка по дате.
+        # SQLite дописывает в конец индекса rowid (= id по возрастанию),
+        # так что индексы покрывают и keyset-порядок (-pub_date, id)
+        indexes = [
+            models.Index(fields=['author', '-pub_date'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['-pub_date', 'id'],
+                         name='post_pub_date_id_idx'),
+        ]
+
+
+class PostSearch(models.Model):
+    # FTS5-индекс по тексту постов, создаётся и обновляется в БД
+    # (см. posts/search.py), Django его только читает
+    post = models.OneToOneField(Post, on_delete=models.DO_NOTHING,
+                                primary_key=True, db_column='rowid',
+                                related_name='search')
+    text = models.TextField()
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'posts_post_fts'
 
 
 class Comment(models.Model):
@@ -38,5 +131,117 @@ class Comment(models.Model):
     def __str__(self):
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        # comment_count и last_comment_at поста обновляются сигналами
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    class Meta:
+        ordering = ['-created']
+        indexes = [
+            models.Index(fields=['post', '-created'],
+                         name='comment_post_created_idx'),
+        ]
+
+
+class Follow(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name="follower")
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name="following")
+    created = models.DateTimeField("date followed", auto_now_add=True)
+    # Посты автора с огромным числом подписчиков не раскладываются
+    # по лентам при публикации, а подмешиваются при чтении
+    pull = models.BooleanField(default=False, editable=False)
+
+    def __str__(self):
+        return f"{self.user_id} -> {self.author_id}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='follow_unique'),
+            models.CheckConstraint(check=~models.Q(user=models.F('author')),
+                                   name='follow_not_self'),
+        ]
+        indexes = [
+            # Рассылка поста подписчикам пачками по user_id
+            models.Index(fields=['author', 'pull', 'user'],
+                         name='follow_author_pull_user_idx'),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Строка материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name="timeline")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name="timeline_entries")
+    # Копия post.pub_date: лента читается одним диапазоном по индексу
+    pub_date = models.DateTimeField()
+
     class Meta:
-        ordering = ['-created']
\ No newline at end of file
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='timeline_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', 'post'],
+                         name='timeline_user_pub_date_idx'),
+        ]
+
+
+class Counter(models.Model):
+    key = models.CharField(max_length=100, unique=True)
+    value = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.key}={self.value}"
+
+
+MEDIA_LOCK_PREFIX = 'media-lock:'
+
+
+def media_lock_key(name):
+    # Имя картинки - хэш содержимого: у каждого содержимого своя
+    # блокировка, несвязанные загрузки друг друга не ждут
+    digest = posixpath.splitext(posixpath.basename(name))[0]
+    return f'{MEDIA_LOCK_PREFIX}{digest}'[:100]
+
+
+def lock_media(name):
+    """
+    Блокировка файла картинки name до конца текущей транзакции. Её берут
+    хранилище, решая, переиспользовать ли уже лежащий файл, и удаление
+    файла без ссылок, так что проверка ссылок и удаление не пересекаются
+    с новой ссылкой. UPDATE одной строки держит блокировку и в SQLite,
+    и в PostgreSQL.
+    """
+    counter = Counter.objects.filter(key=media_lock_key(name))
+    if not counter.update(value=F('value') + 1):
+        Counter.objects.get_or_create(key=media_lock_key(name))
+        counter.update(value=F('value') + 1)
+
+
+def unlock_media(name):
+    """Удаляет строку блокировки вместе с последней ссылкой на файл."""
+    Counter.objects.filter(key=media_lock_key(name)).delete()
+
+
+class UserCounters(models.Model):
+    """
+    Счётчики карточки автора. Меняются атомарно в сигналах подписок
+    и постов, читаются одним JOIN вместе с User.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                primary_key=True, related_name="counters")
+    followers = models.PositiveIntegerField(default=0)
+    following = models.PositiveIntegerField(default=0)
+    posts = models.PositiveIntegerField(default=0)
+    # Когда последний раз менялись посты автора или комментарии к ним:
+    # версия страницы профиля без агрегатов по его постам
+    posts_changed = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return (f"{self.user_id}: followers={self.followers}, "
+                f"following={self.following}, posts={self.posts}")
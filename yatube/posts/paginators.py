@@ -0,0 +1,319 @@
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+from datetime import datetime
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from . import counters
+
+POSTS_PER_PAGE = 10
+USERS_PER_PAGE = 50
+COMMENTS_PER_PAGE = 20
+FEED_ORDERING = ('-pub_date', 'id')
+# Совпадает с индексом (post, -created): id в SQLite хранится в индексе
+COMMENT_ORDERING = ('-created', 'id')
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def _value(obj, name):
+    if isinstance(obj, dict):
+        return obj[name]
+    return getattr(obj, name)
+
+
+def _keys(ordering):
+    return [(field.lstrip('-'), field.startswith('-')) for field in ordering]
+
+
+def _to_python(model, name, value):
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        # Ключ-аннотация - rank поиска, число с плавающей точкой
+        return float(value)
+    return field.to_python(value)
+
+
+def encode_cursor(direction, obj, ordering=FEED_ORDERING):
+    values = []
+    for name, _ in _keys(ordering):
+        value = _value(obj, name)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        values.append(value)
+    raw = json.dumps([direction] + values, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, model, ordering=FEED_ORDERING):
+    """Возвращает (направление, значения ключей) или None для мусора."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, *values = json.loads(
+            base64.urlsafe_b64decode(padded.encode())
+        )
+        keys = _keys(ordering)
+        if direction not in (NEXT, PREVIOUS) or len(values) != len(keys):
+            return None
+        # null, списки и объекты в ключах ломают условие beyond()
+        if not all(isinstance(value, (str, int, float))
+                   and not isinstance(value, bool) for value in values):
+            return None
+        values = [
+            _to_python(model, name, value)
+            for (name, _), value in zip(keys, values)
+        ]
+    except (binascii.Error, UnicodeError, ValueError, TypeError,
+            ValidationError):
+        return None
+    return direction, values
+
+
+def sort_by_ordering(items, ordering):
+    """Сортирует объекты в памяти так же, как order_by(*ordering)."""
+    items = list(items)
+    # Устойчивая сортировка от младшего ключа к старшему
+    for name, descending in reversed(_keys(ordering)):
+        items.sort(key=lambda item: _value(item, name), reverse=descending)
+    return items
+
+
+def reversed_ordering(ordering):
+    return [
+        field[1:] if field.startswith('-') else f'-{field}'
+        for field in ordering
+    ]
+
+
+def beyond(ordering, values):
+    # Условие "строго дальше курсора" в порядке ordering:
+    # (k1 > v1) OR (k1 = v1 AND k2 > v2) OR ...
+    # Избыточное k1 >= v1 нужно планировщику: по OR он не умеет
+    # начинать поиск по индексу с середины, а по диапазону умеет
+    keys = _keys(ordering)
+    condition = Q()
+    equal = {}
+    for (name, descending), value in zip(keys, values):
+        lookup = 'lt' if descending else 'gt'
+        condition |= Q(**equal, **{f'{name}__{lookup}': value})
+        equal[name] = value
+    name, descending = keys[0]
+    return Q(**{f'{name}__{"lte" if descending else "gte"}': values[0]}) & (
+        condition
+    )
+
+
+class CursorPage(Sequence):
+    number = None
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<Cursor page of {len(self)} items>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+    @cached_property
+    def next_cursor(self):
+        if not self.has_next():
+            return None
+        return encode_cursor(NEXT, self[-1], self.paginator.ordering)
+
+    @cached_property
+    def previous_cursor(self):
+        if not self.has_previous():
+            return None
+        return encode_cursor(PREVIOUS, self[0], self.paginator.ordering)
+
+
+class CursorPaginator:
+    """
+    Keyset-паджинатор: страница выбирается условием по ключам сортировки
+    вместо OFFSET, поэтому глубокие страницы стоят столько же, сколько
+    первая. Последний ключ в ordering должен быть уникальным.
+    """
+
+    def __init__(self, object_list, per_page, ordering=FEED_ORDERING,
+                 counter_key=None, count=None):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.counter_key = counter_key
+        self.known_count = count
+
+    @cached_property
+    def count(self):
+        if self.known_count is not None:
+            return self.known_count
+        if self.counter_key is None:
+            return self.object_list.count()
+        return counters.get_count(self.counter_key, self.object_list)
+
+    def fetch(self, ordering, values=None):
+        """До per_page + 1 записей строго после values в порядке ordering."""
+        object_list = self.object_list
+        if values is not None:
+            object_list = object_list.filter(beyond(ordering, values))
+        return list(object_list.order_by(*ordering)[:self.per_page + 1])
+
+    def page(self, cursor=None):
+        decoded = None
+        if cursor:
+            decoded = decode_cursor(
+                cursor, self.object_list.model, self.ordering
+            )
+        if decoded is None:
+            items = self.fetch(self.ordering)
+            return CursorPage(items[:self.per_page], self,
+                              has_next=len(items) > self.per_page,
+                              has_previous=False)
+
+        direction, values = decoded
+        if direction == NEXT:
+            items = self.fetch(self.ordering, values)
+            return CursorPage(items[:self.per_page], self,
+                              has_next=len(items) > self.per_page,
+                              has_previous=True)
+
+        items = self.fetch(reversed_ordering(self.ordering), values)
+        has_previous = len(items) > self.per_page
+        items = items[:self.per_page]
+        items.reverse()
+        return CursorPage(items, self,
+                          has_next=True, has_previous=has_previous)
+
+
+class FeedPage(Page):
+    @cached_property
+    def next_cursor(self):
+        if not self.has_next():
+            return None
+        return encode_cursor(NEXT, self[-1], self.paginator.ordering)
+
+    @cached_property
+    def previous_cursor(self):
+        if not self.has_previous():
+            return None
+        return encode_cursor(PREVIOUS, self[0], self.paginator.ordering)
+
+
+class FeedPaginator(Paginator):
+    """
+    Обычный паджинатор по номеру страницы (?page=N), который дополнительно
+    отдаёт курсоры соседних страниц для перехода в keyset-режим.
+    С counter_key число записей берётся из таблицы счётчиков, а не из
+    COUNT(*) на каждый запрос; уже известное число можно передать в count.
+    Такой счётчик может разойтись с таблицей, поэтому страница читается
+    с одной лишней строкой. Если она или номер страницы противоречат
+    счётчику, записи пересчитываются по таблице и счётчик сохраняется:
+    на последней странице не теряются записи, а за ней нет пустых.
+    """
+    recounted = False
+
+    def __init__(self, object_list, per_page, ordering=FEED_ORDERING,
+                 counter_key=None, count=None, **kwargs):
+        self.ordering = tuple(ordering)
+        self.counter_key = counter_key
+        self.known_count = count
+        super().__init__(object_list.order_by(*self.ordering), per_page,
+                         **kwargs)
+
+    @cached_property
+    def count(self):
+        if self.known_count is not None:
+            return self.known_count
+        if self.counter_key is None:
+            return super().count
+        return counters.get_count(self.counter_key, self.object_list)
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            # Номер за концом: может быть, это счётчик отстал от таблицы
+            if not self.recount():
+                raise
+            return super().validate_number(number)
+
+    def page(self, number):
+        if self.counter_key is None or self.known_count is not None:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        items = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if len(items) <= self.per_page:
+            # Неполная страница - последняя, записей ровно bottom + len
+            drifted = bottom + len(items) != self.count
+        else:
+            # Дальше есть записи, а по счётчику страница последняя
+            drifted = number >= self.num_pages
+        if drifted and self.recount() and number > self.num_pages:
+            raise EmptyPage('That page contains no results')
+        return self._get_page(items[:self.per_page], number, self)
+
+    def get_page(self, number):
+        try:
+            return super().get_page(number)
+        except EmptyPage:
+            # Счётчик был больше числа записей, count уже пересчитан
+            return self.page(self.num_pages)
+
+    def recount(self):
+        """
+        Один раз за запрос пересчитывает записи по таблице и сохраняет
+        в счётчик. True, если число изменилось.
+        """
+        if (self.counter_key is None or self.known_count is not None
+                or self.recounted):
+            return False
+        self.recounted = True
+        counters.delete(self.counter_key)
+        count = counters.get_count(self.counter_key, self.object_list)
+        if count == self.count:
+            return False
+        self.count = count
+        self.__dict__.pop('num_pages', None)
+        return True
+
+    def _get_page(self, *args, **kwargs):
+        return FeedPage(*args, **kwargs)
+
+
+def get_feed_page(request, object_list, per_page=POSTS_PER_PAGE,
+                  ordering=FEED_ORDERING, counter_key=None, count=None):
+    """
+    ?cursor=<токен> включает keyset-режим, иначе работает старый
+    ?page=N, чтобы не ломать сохранённые ссылки.
+    """
+    cursor = request.GET.get('cursor')
+    if cursor is not None:
+        paginator = CursorPaginator(object_list, per_page, ordering,
+                                    counter_key, count)
+        return paginator.page(cursor)
+    paginator = FeedPaginator(object_list, per_page, ordering, counter_key,
+                              count)
+    return paginator.get_page(request.GET.get('page'))
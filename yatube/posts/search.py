@@ -0,0 +1,120 @@
+"""
+Полнотекстовый поиск по Post.text.
+
+На SQLite это FTS5-таблица posts_post_fts с внешним содержимым
+(content='posts_post'): в ней только инвертированный индекс, сам текст
+читается из posts_post. Индекс держат в актуальном состоянии триггеры,
+так что его не обходят ни update(), ни bulk_create, ни правки в БД.
+"""
+import re
+
+from django.db import connections
+from django.db.models import F, FloatField, TextField, Value
+from django.db.models.lookups import Lookup
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+MAX_TERMS = 10
+
+SQLITE_SCHEMA = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        text,
+        content='posts_post',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert
+    AFTER INSERT ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete
+    AFTER DELETE ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+    AFTER UPDATE OF text ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+]
+TRIGGERS = [f'{FTS_TABLE}_insert', f'{FTS_TABLE}_delete',
+            f'{FTS_TABLE}_update']
+
+
+def install_search_index(connection):
+    """
+    Создаёт индекс и триггеры, если их нет. Вызывается из миграции и
+    после каждого migrate: пересборка таблицы posts_post в SQLite
+    (ALTER через копию таблицы) молча удаляет её триггеры.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master "
+            "WHERE type = 'trigger' AND name IN (%s, %s, %s)", TRIGGERS
+        )
+        complete = cursor.fetchone()[0] == len(TRIGGERS)
+        if complete:
+            return
+        for statement in SQLITE_SCHEMA:
+            cursor.execute(statement)
+        # Без триггеров индекс мог отстать - перечитываем posts_post
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+        )
+
+
+@TextField.register_lookup
+class Match(Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+def fts_query(query):
+    """
+    Строка пользователя -> запрос FTS5: все слова обязательны, каждое
+    в кавычках (никакого синтаксиса FTS5 снаружи), последнее - префиксом,
+    чтобы находилось и недописанное слово.
+    """
+    terms = re.findall(r'\w+', query.lower())[:MAX_TERMS]
+    if not terms:
+        return None
+    *head, last = terms
+    return ' '.join([f'"{term}"' for term in head] + [f'"{last}"*'])
+
+
+def search_posts(query, posts=None):
+    """
+    Посты, подходящие под query, с аннотацией rank (меньше - лучше).
+    Сортировка (rank, id) годится для keyset-паджинации.
+    """
+    if posts is None:
+        posts = Post.objects.all()
+    match = fts_query(query)
+    if match is None:
+        return posts.none().annotate(
+            rank=Value(0.0, output_field=FloatField()))
+    if connections[posts.db].vendor != 'sqlite':
+        # Без FTS5 (не SQLite) - медленный, но рабочий LIKE
+        terms = re.findall(r'\w+', query)[:MAX_TERMS]
+        for term in terms:
+            posts = posts.filter(text__icontains=term)
+        return posts.annotate(rank=Value(0.0, output_field=FloatField()))
+    return posts.filter(search__text__match=match).annotate(
+        rank=F('search__rank'))
@@ -0,0 +1,232 @@
+import json
+from threading import local
+
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import counters, timeline
+from .cache import (INDEX_PAGES, USERS_PAGES, group_pages, invalidate_pages,
+                    invalidate_post_card)
+from .models import (Comment, Follow, Group, Post, User, UserCounters,
+                     lock_media, unlock_media)
+from .thumbnails import derived_names
+
+
+def _update_post_counters(post, delta, group_id):
+    counters.increment(counters.ALL_POSTS_KEY, delta, Post.objects.all())
+    counters.increment_user(post.author_id, posts=delta,
+                            posts_changed=timezone.now())
+    if group_id is not None:
+        counters.increment(counters.group_posts_key(group_id), delta,
+                           Post.objects.filter(group_id=group_id))
+
+
+def _move_post_counters(old_group_id, new_group_id):
+    if old_group_id is not None:
+        counters.increment(counters.group_posts_key(old_group_id), -1,
+                           Post.objects.filter(group_id=old_group_id))
+    if new_group_id is not None:
+        counters.increment(counters.group_posts_key(new_group_id), 1,
+                           Post.objects.filter(group_id=new_group_id))
+
+
+def _invalidate_feed_pages(*group_ids):
+    # Пост виден на главной и на странице своей группы, остальные
+    # закэшированные страницы он не затрагивает
+    group_ids = [group_id for group_id in group_ids if group_id is not None]
+    slugs = Group.objects.filter(pk__in=group_ids).values_list('slug',
+                                                               flat=True)
+    invalidate_pages(INDEX_PAGES, *(group_pages(slug) for slug in slugs))
+
+
+def _file_name(value):
+    return getattr(value, 'name', value) or ''
+
+
+def _image_files(image, thumbnail, variants):
+    files = {_file_name(image), _file_name(thumbnail)}
+    for widths in (json.loads(variants) if variants else {}).values():
+        files.update(widths.values())
+    files.discard('')
+    return files
+
+
+def release_image(image, thumbnail, variants):
+    """
+    Удаляет картинку и её миниатюры после коммита, если на картинку
+    больше не ссылается ни один пост: одинаковые загрузки хранятся
+    одним файлом, см. posts/storage.py.
+    """
+    image = _file_name(image)
+    if not image:
+        return
+    # Копия миниатюр в строке могла устареть (фоновая задача дописала
+    # их позже), поэтому удаляем и все имена, выводимые из картинки
+    files = _image_files(image, thumbnail, variants) | derived_names(image)
+    storage = Post._meta.get_field('image').storage
+
+    def release():
+        # Под той же блокировкой, что и загрузка: файл не переиспользуют
+        # между проверкой ссылок и удалением
+        with transaction.atomic():
+            lock_media(image)
+            if Post.objects.filter(image=image).exists():
+                return
+            for name in files:
+                storage.delete(name)
+            unlock_media(image)
+
+    transaction.on_commit(release)
+
+
+def _remember_post_state(post):
+    post._saved_group_id = post.__dict__.get('group_id')
+    post._saved_image = (post.__dict__.get('image'),
+                         post.__dict__.get('thumbnail'),
+                         post.__dict__.get('variants'))
+    post._saved_cache_version = None
+    if (post.__dict__.get('updated') is not None
+            and {'comment_count', 'last_comment_at'} <= post.__dict__.keys()):
+        post._saved_cache_version = post.cache_version
+
+
+@receiver(post_init, sender=Post)
+def remember_post_state(sender, instance, **kwargs):
+    # Через __dict__, чтобы не догружать отложенные поля при .only()
+    _remember_post_state(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    old_group_id = instance._saved_group_id
+    if created:
+        _update_post_counters(instance, 1, instance.group_id)
+        timeline.schedule_publish(instance)
+    else:
+        counters.increment_user(instance.author_id,
+                                posts_changed=timezone.now())
+        if old_group_id != instance.group_id:
+            _move_post_counters(old_group_id, instance.group_id)
+        if instance._saved_cache_version is not None:
+            invalidate_post_card(instance.pk, instance._saved_cache_version)
+        if _file_name(instance._saved_image[0]) != instance.image.name:
+            release_image(*instance._saved_image)
+    _invalidate_feed_pages(old_group_id, instance.group_id)
+    _remember_post_state(instance)
+
+
+# Посты, удаляемые в этом потоке прямо сейчас: их комментарии уходят
+# каскадом, и пересчитывать статистику удаляемого поста незачем
+_deleting = local()
+
+
+def _deleting_posts():
+    if not hasattr(_deleting, 'posts'):
+        _deleting.posts = set()
+    return _deleting.posts
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    _deleting_posts().add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    _deleting_posts().discard(instance.pk)
+    _update_post_counters(instance, -1, instance.group_id)
+    invalidate_post_card(instance.pk, instance.cache_version)
+    _invalidate_feed_pages(instance.group_id)
+    release_image(instance.image, instance.thumbnail, instance.variants)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_pages(group_pages(instance.slug))
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    counters.delete(counters.group_posts_key(instance.pk))
+    invalidate_pages(group_pages(instance.slug))
+
+
+def _invalidate_author_cards(author):
+    # Имя автора и ссылка на его профиль есть в каждой карточке поста
+    posts = Post.objects.filter(author=author).only(
+        'updated', 'comment_count', 'last_comment_at', 'group_id')
+    group_ids = set()
+    for post in posts.iterator():
+        invalidate_post_card(post.pk, post.cache_version)
+        group_ids.add(post.group_id)
+    _invalidate_feed_pages(*group_ids)
+
+
+@receiver(post_init, sender=User)
+def remember_user_state(sender, instance, **kwargs):
+    instance._saved_username = instance.__dict__.get('username')
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw, update_fields, **kwargs):
+    # Строка счётчиков есть у каждого пользователя с момента создания,
+    # тогда карточка автора читается одним JOIN
+    if created and not raw:
+        UserCounters.objects.get_or_create(user=instance)
+    # Вход в систему обновляет только last_login, справочник не меняется
+    if update_fields is None or not set(update_fields) <= {'last_login'}:
+        invalidate_pages(USERS_PAGES)
+    if not created and instance._saved_username != instance.username:
+        _invalidate_author_cards(instance)
+    instance._saved_username = instance.username
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    invalidate_pages(USERS_PAGES)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.increment_user(instance.author_id, followers=1)
+        counters.increment_user(instance.user_id, following=1)
+        timeline.followed(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.increment_user(instance.author_id, followers=-1)
+    counters.increment_user(instance.user_id, following=-1)
+    timeline.unfollowed(instance)
+
+
+def _comment_changed(comment, update_stats):
+    # Версию карточки и группу берём до обновления счётчика
+    post = Post.objects.filter(pk=comment.post_id).only(
+        'updated', 'comment_count', 'last_comment_at', 'group_id',
+        'author_id').first()
+    update_stats(comment)
+    if post is not None:
+        counters.increment_user(post.author_id,
+                                posts_changed=timezone.now())
+        invalidate_post_card(post.pk, post.cache_version)
+        _invalidate_feed_pages(post.group_id)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        _comment_changed(instance, counters.comment_added)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.post_id in _deleting_posts():
+        # Карточку и страницы сбросит удаление самого поста
+        return
+    _comment_changed(instance, counters.comment_deleted)
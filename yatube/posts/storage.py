@@ -0,0 +1,54 @@
+"""
+Хранилище картинок постов с адресацией по содержимому.
+
+Имя файла - sha256 содержимого, поэтому одинаковые загрузки ложатся
+в один файл (и получают общие миниатюры). Файл удаляется, только когда
+на него не ссылается ни один пост, см. release_image в signals.py.
+"""
+import hashlib
+import os
+import posixpath
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+def content_name(name, digest):
+    # Две первые буквы хэша - подкаталог, чтобы не копить
+    # сотни тысяч файлов в одном каталоге
+    directory = posixpath.dirname(name)
+    extension = os.path.splitext(name)[1].lower()
+    return posixpath.join(directory, digest[:2], digest + extension)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = content_name(self.generate_filename(name),
+                            content_hash(content))
+        # Хэш посчитан без блокировки; решение переиспользовать файл -
+        # под ней, до коммита ссылки (Post.save идёт в транзакции)
+        from .models import lock_media
+        lock_media(name)
+        if self.exists(name):
+            return name
+        return self._save(name, content)
+
+
+post_image_storage = ContentAddressedStorage()
@@ -0,0 +1,10 @@
+from django import template
+
+from posts.cache import viewer_role
+
+register = template.Library()
+
+
+@register.filter
+def card_role(post, user):
+    return viewer_role(post, user)
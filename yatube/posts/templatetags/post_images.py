@@ -0,0 +1,23 @@
+from django import template
+from django.core.files.storage import default_storage
+
+from posts.thumbnails import SOURCE_FORMATS
+
+register = template.Library()
+
+
+@register.filter
+def image_srcset(post, image_format):
+    widths = post.image_variants.get(image_format, {})
+    # В JSON ключи-ширины стали строками
+    return ', '.join(
+        f'{default_storage.url(name)} {width}w'
+        for width, name in sorted(widths.items(), key=lambda w: int(w[0]))
+    )
+
+
+@register.filter
+def image_sources(post):
+    variants = post.image_variants
+    return [(f'image/{image_format}', image_srcset(post, image_format))
+            for image_format in SOURCE_FORMATS if image_format in variants]
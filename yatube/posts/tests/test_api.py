@@ -0,0 +1,125 @@
+import datetime
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import api
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='title',
+            description='description',
+            slug='test-slug'
+        )
+        cls.user = User.objects.create_user(username='TestUser',
+                                            first_name='Имя')
+        cls.posts = [
+            Post.objects.create(text=f'text{i}', author=cls.user,
+                                group=cls.group if i % 2 else None)
+            for i in range(15)
+        ]
+        cls.post = cls.posts[-1]
+        Comment.objects.create(post=cls.post, author=cls.user,
+                               text='comment')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def get(self, name, *args, **params):
+        return self.guest_client.get(reverse(f'api_v1:{name}', args=args),
+                                     params)
+
+    def test_feeds_walk_by_cursor(self):
+        """Ленты API листаются курсором и отдают JSON"""
+        feeds = {
+            'posts': ((), 15),
+            'group_posts': ((ApiTests.group.slug,), 7),
+            'user_posts': ((ApiTests.user.username,), 15),
+        }
+        for name, (args, total) in feeds.items():
+            with self.subTest(feed=name):
+                ids = []
+                cursor = None
+                while True:
+                    params = {'cursor': cursor} if cursor else {}
+                    response = self.get(name, *args, **params)
+                    self.assertEqual(response['Content-Type'],
+                                     'application/json')
+                    data = response.json()
+                    ids += [post['id'] for post in data['results']]
+                    cursor = data['next']
+                    if cursor is None:
+                        break
+                self.assertEqual(len(ids), total)
+                self.assertEqual(len(set(ids)), total)
+
+    def test_sparse_fields(self):
+        """?fields= оставляет только запрошенные поля"""
+        data = self.get('posts', fields='text,author', limit=2).json()
+        self.assertEqual(data['results'], [
+            {'text': 'text14', 'author': 'TestUser'},
+            {'text': 'text13', 'author': 'TestUser'},
+        ])
+        response = self.get('posts', fields='text,password')
+        self.assertEqual(response.status_code, 400)
+
+    def test_post_user_and_comments(self):
+        """Пост, профиль и комментарии"""
+        post = ApiTests.post
+        args = (ApiTests.user.username, post.pk)
+        data = self.get('post', *args).json()
+        self.assertEqual((data['text'], data['group'], data['comment_count']),
+                         (post.text, None, 1))
+        data = self.get('post_comments', *args).json()
+        self.assertEqual([comment['text'] for comment in data['results']],
+                         ['comment'])
+        data = self.get('user', ApiTests.user.username).json()
+        self.assertEqual((data['first_name'], data['posts']), ('Имя', 15))
+        self.assertEqual(self.get('post', 'nobody', post.pk).status_code,
+                         404)
+
+    def test_etags(self):
+        """Повтор с If-None-Match отвечает 304 без тела"""
+        post = ApiTests.post
+        for name, args in (
+            ('posts', ()),
+            ('groups', ()),
+            ('post', (ApiTests.user.username, post.pk)),
+            ('user_posts', (ApiTests.user.username,)),
+        ):
+            with self.subTest(endpoint=name):
+                url = reverse(f'api_v1:{name}', args=args)
+                etag = self.guest_client.get(url)['ETag']
+                response = self.guest_client.get(url,
+                                                 HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+
+    def test_datetime_format(self):
+        """Даты в ответе одинаковы с orjson и без него"""
+        Post.objects.filter(pk=self.post.pk).update(pub_date=datetime.datetime(
+            2020, 1, 2, 3, 4, 5, 678901, tzinfo=datetime.timezone.utc))
+        bodies = []
+        for orjson in (api.orjson, None):
+            with self.subTest(orjson=orjson), \
+                    mock.patch.object(api, 'orjson', orjson):
+                response = self.get('post', 'TestUser', self.post.pk,
+                                    fields='id,pub_date')
+                bodies.append(response.content)
+                self.assertEqual(
+                    response.content.decode(),
+                    f'{{"id":{self.post.pk},'
+                    f'"pub_date":"2020-01-02T03:04:05.678Z"}}'
+                )
+        self.assertEqual(bodies[0], bodies[1])
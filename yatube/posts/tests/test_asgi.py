@@ -0,0 +1,116 @@
+import asyncio
+import threading
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TransactionTestCase
+from django.urls import reverse
+
+from posts.models import Post
+from yatube.asgi import WsgiToAsgi, application
+
+User = get_user_model()
+
+
+def asgi_get(path, query_string=b'', app=application, on_send=None):
+    scope = {
+        'type': 'http',
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'root_path': '',
+        'query_string': query_string,
+        'headers': [(b'host', b'testserver')],
+        'server': ('testserver', 80),
+        'client': ('127.0.0.1', 50000),
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+        if on_send:
+            on_send(message)
+
+    asyncio.run(app(scope, receive, send))
+    start = messages[0]
+    body = b''.join(message['body'] for message in messages[1:])
+    return start['status'], dict(start['headers']), body
+
+
+class AsgiApplicationTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(username='Author')
+        self.post = Post.objects.create(text='asgi text', author=author)
+
+    def test_feeds_are_served(self):
+        """Ленты отдаются через ASGI-приложение"""
+        urls = [
+            reverse('index'),
+            reverse('profile', args=['Author']),
+            reverse('post', args=['Author', self.post.pk]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                status, headers, body = asgi_get(url)
+                self.assertEqual(status, 200)
+                self.assertIn('asgi text', body.decode())
+                self.assertIn(b'content-type', headers)
+
+    def test_not_found(self):
+        """Несуществующая страница даёт 404"""
+        status, _, _ = asgi_get(reverse('profile', args=['nobody']))
+        self.assertEqual(status, 404)
+
+
+class AsgiStreamingTests(TransactionTestCase):
+    def stream_app(self, produced):
+        sent = threading.Event()
+        self.closed = threading.Event()
+
+        def chunks():
+            try:
+                yield b'first'
+                # Второй чанк - только после отправки первого клиенту
+                produced.append(sent.wait(timeout=5))
+                yield b'second'
+            finally:
+                self.closed.set()
+
+        def wsgi_app(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return chunks()
+
+        return WsgiToAsgi(wsgi_app, max_workers=1), sent
+
+    def test_chunks_are_sent_as_produced(self):
+        """Чанки потокового ответа уходят клиенту сразу"""
+        produced = []
+        app, sent = self.stream_app(produced)
+
+        def on_send(message):
+            if message.get('body') == b'first':
+                sent.set()
+
+        status, _, body = asgi_get('/', app=app, on_send=on_send)
+        self.assertEqual(status, 200)
+        self.assertEqual(body, b'firstsecond')
+        self.assertEqual(produced, [True])
+        self.assertTrue(self.closed.is_set())
+
+    def test_stream_is_closed_when_client_is_gone(self):
+        """Если отправка упала, итератор ответа закрывается"""
+        app, sent = self.stream_app([])
+
+        def on_send(message):
+            if message.get('body') == b'first':
+                sent.set()
+                raise OSError('client is gone')
+
+        with self.assertRaises(OSError):
+            asgi_get('/', app=app, on_send=on_send)
+        self.assertTrue(self.closed.wait(timeout=10))
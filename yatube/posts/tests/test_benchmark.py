@@ -0,0 +1,40 @@
+import json
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.models import Comment, Post, UserCounters
+
+
+class BenchmarkTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_seed_and_benchmark(self):
+        """seed_data строит неравномерные данные, benchmark пишет JSON"""
+        call_command('seed_data', '--posts', '500', '--batch-size', '200',
+                     stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 500)
+        self.assertTrue(Comment.objects.exists())
+        top, *rest = UserCounters.objects.order_by('-posts').values_list(
+            'posts', flat=True)
+        self.assertGreater(top, 3 * rest[-1])
+
+        out = StringIO()
+        call_command('benchmark', '--iterations', '3', '--warmup', '1',
+                     stdout=out, stderr=StringIO())
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['dataset']['posts'], 500)
+        self.assertEqual(set(report['results']), {
+            'index', 'group_posts', 'profile', 'post', 'new_post',
+            'add_comment',
+        })
+        for name, result in report['results'].items():
+            with self.subTest(view=name):
+                self.assertEqual(result['errors'], 0)
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+                self.assertGreater(result['queries'], 0)
+        # Записи бенчмарка откатываются
+        self.assertEqual(Post.objects.count(), 500)
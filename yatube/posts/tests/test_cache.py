@@ -0,0 +1,280 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.cache import post_card_keys
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(text='old text',
+                                        author=PostCardCacheTests.author)
+        self.guest_client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(PostCardCacheTests.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(PostCardCacheTests.reader)
+
+    def test_card_is_served_from_cache(self):
+        """Повторный показ карточки берётся из кэша"""
+        self.guest_client.get(reverse('index'))
+        # update() обходит save(), версия поста не меняется
+        Post.objects.filter(pk=self.post.pk).update(text='sneaky text')
+        response = self.guest_client.get(reverse('index'))
+        self.assertContains(response, 'old text')
+        self.assertNotContains(response, 'sneaky text')
+
+    def test_card_depends_on_viewer_role(self):
+        """Гость, читатель и автор получают разные карточки"""
+        edit_url = reverse('post_edit',
+                           args=[PostCardCacheTests.author.username,
+                                 self.post.pk])
+        response = self.guest_client.get(reverse('index'))
+        self.assertNotContains(response, 'Добавить комментарий')
+        response = self.reader_client.get(reverse('index'))
+        self.assertContains(response, 'Добавить комментарий')
+        self.assertNotContains(response, edit_url)
+        response = self.author_client.get(reverse('index'))
+        self.assertContains(response, edit_url)
+
+    def test_edit_evicts_card(self):
+        """Редактирование через post_edit сбрасывает карточку"""
+        self.guest_client.get(reverse('index'))
+        old_keys = post_card_keys(self.post.pk, self.post.cache_version)
+        self.assertTrue(cache.get_many(old_keys))
+        self.author_client.post(
+            reverse('post_edit', args=[PostCardCacheTests.author.username,
+                                       self.post.pk]),
+            {'text': 'new text'}
+        )
+        self.assertFalse(cache.get_many(old_keys))
+        response = self.guest_client.get(reverse('index'))
+        self.assertContains(response, 'new text')
+
+    def test_comment_evicts_card(self):
+        """Новый комментарий сбрасывает карточку"""
+        self.guest_client.get(reverse('index'))
+        old_keys = post_card_keys(self.post.pk, self.post.cache_version)
+        self.reader_client.post(
+            reverse('add_comment', args=[PostCardCacheTests.author.username,
+                                         self.post.pk]),
+            {'text': 'comment'}
+        )
+        self.assertFalse(cache.get_many(old_keys))
+        response = self.guest_client.get(reverse('index'))
+        self.assertContains(response, 'Комментариев: 1')
+
+    def test_comment_cycle_changes_version(self):
+        """Добавить, удалить и снова добавить комментарий - новая версия"""
+        comment = self.post.comments.create(author=PostCardCacheTests.reader,
+                                            text='first')
+        self.post.refresh_from_db()
+        version = self.post.cache_version
+        comment.delete()
+        self.post.comments.create(author=PostCardCacheTests.reader,
+                                  text='second')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        self.assertNotEqual(self.post.cache_version, version)
+
+    def test_author_rename_evicts_cards(self):
+        """Новое имя автора сразу видно в карточках и ссылках"""
+        self.guest_client.get(reverse('index'))
+        self.reader_client.get(reverse('index'))
+        author = User.objects.get(pk=PostCardCacheTests.author.pk)
+        author.username = 'Renamed'
+        author.save()
+        for client in (self.guest_client, self.reader_client):
+            with self.subTest(client=client):
+                response = client.get(reverse('index'))
+                self.assertContains(response, '@Renamed')
+                self.assertContains(response, '/Renamed/')
+                self.assertNotContains(response, '@Author')
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(title='title', slug='group',
+                                         description='description')
+        cls.other_group = Group.objects.create(title='other', slug='other',
+                                               description='description')
+        cls.pages = [
+            reverse('index'),
+            reverse('group_posts', args=[cls.group.slug]),
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(AnonymousPageCacheTests.author)
+
+    def test_anonymous_pages_are_cached(self):
+        """Гостю повторно отдаётся закэшированная страница"""
+        for url in AnonymousPageCacheTests.pages:
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                self.assertIsNotNone(first.context)
+                with self.assertNumQueries(0):
+                    second = self.guest_client.get(url)
+                self.assertIsNone(second.context)
+                self.assertEqual(first.content, second.content)
+                self.assertEqual(first['ETag'], second['ETag'])
+                self.assertIn('Last-Modified', second)
+
+    def test_conditional_get(self):
+        """Совпавший ETag или Last-Modified даёт 304"""
+        for url in AnonymousPageCacheTests.pages:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                by_etag = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(by_etag.status_code, 304)
+                by_date = self.guest_client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+                self.assertEqual(by_date.status_code, 304)
+
+    def test_authorized_pages_are_not_cached(self):
+        """Авторизованному пользователю страница рендерится заново"""
+        url = reverse('index')
+        self.author_client.get(url)
+        response = self.author_client.get(url)
+        self.assertIsNotNone(response.context)
+
+    def test_new_post_invalidates_only_its_pages(self):
+        """Новый пост сбрасывает главную и свою группу, но не чужую"""
+        other_url = reverse('group_posts',
+                            args=[AnonymousPageCacheTests.other_group.slug])
+        for url in AnonymousPageCacheTests.pages + [other_url]:
+            self.guest_client.get(url)
+        self.author_client.post(reverse('new_post'), {
+            'text': 'fresh post',
+            'group': AnonymousPageCacheTests.group.pk,
+        })
+        for url in AnonymousPageCacheTests.pages:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertIsNotNone(response.context)
+                self.assertContains(response, 'fresh post')
+        self.assertIsNone(self.guest_client.get(other_url).context)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+
+    def setUp(self):
+        self.post = Post.objects.create(text='text',
+                                        author=ConditionalGetTests.author)
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(ConditionalGetTests.reader)
+        self.urls = {
+            'post': reverse('post', args=[ConditionalGetTests.author.username,
+                                          self.post.pk]),
+            'profile': reverse('profile',
+                               args=[ConditionalGetTests.author.username]),
+        }
+        # Проверка свежести - один запрос, счётчики автора приходят в нём
+        self.check_queries = {'post': 1, 'profile': 1}
+
+    def test_not_modified(self):
+        """Совпавший ETag даёт 304 без рендера страницы"""
+        for name, url in self.urls.items():
+            with self.subTest(url=url):
+                etag = self.guest_client.get(url)['ETag']
+                with self.assertNumQueries(self.check_queries[name]):
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertIsNone(response.context)
+
+    def test_comment_changes_etag(self):
+        """Новый комментарий меняет ETag страниц поста и профиля"""
+        etags = {
+            url: self.guest_client.get(url)['ETag']
+            for url in self.urls.values()
+        }
+        self.reader_client.post(self.urls['post'], {'text': 'comment'})
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.guest_client.get(url,
+                                                 HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_profile_check_does_not_read_posts(self):
+        """Свежесть профиля - по версии в счётчиках, без агрегатов"""
+        url = self.urls['profile']
+        etag = self.guest_client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as context:
+            response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertNotIn('"posts_post"', context[0]['sql'])
+
+        self.post.text = 'edited'
+        self.post.save()
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_login_changes_etag(self):
+        """После нового входа страница с формами приходит с новым токеном"""
+        reader = ConditionalGetTests.reader
+        reader.set_password('password')
+        reader.save()
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(reader)
+        etags = {url: client.get(url)['ETag'] for url in self.urls.values()}
+        client.post(reverse('logout'))
+        client.get(reverse('login'))
+        response = client.post(reverse('login'), {
+            'username': reader.username, 'password': 'password',
+            'csrfmiddlewaretoken': client.cookies['csrftoken'].value,
+        })
+        self.assertEqual(response.status_code, 302)
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_author_name_changes_etag(self):
+        """Новое имя автора меняет ETag страниц поста и профиля"""
+        etags = {
+            url: self.guest_client.get(url)['ETag']
+            for url in self.urls.values()
+        }
+        author = ConditionalGetTests.author
+        author.first_name = 'Новое'
+        author.save()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.guest_client.get(url,
+                                                 HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_viewer(self):
+        """Гость и пользователь получают разные ETag"""
+        for url in self.urls.values():
+            with self.subTest(url=url):
+                etag = self.guest_client.get(url)['ETag']
+                response = self.reader_client.get(url,
+                                                  HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
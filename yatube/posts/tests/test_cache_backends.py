@@ -0,0 +1,108 @@
+import shutil
+import tempfile
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from yatube.cache_backends import LRUCache
+
+
+class LRUCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = LRUCache('test-lru', {'OPTIONS': {'MAX_SIZE': 2000}})
+        self.cache.clear()
+
+    def test_size_based_eviction(self):
+        """При переполнении вытесняются давно не читанные записи"""
+        for i in range(3):
+            self.cache.set(f'key{i}', 'x' * 600)
+        # key0 прочитан последним и переживает вытеснение
+        self.cache.get('key0')
+        self.cache.set('key3', 'x' * 600)
+        self.assertIsNotNone(self.cache.get('key0'))
+        self.assertIsNone(self.cache.get('key1'))
+        self.assertIsNotNone(self.cache.get('key3'))
+        self.assertLessEqual(self.cache.get_stats()['size'], 2000)
+
+    def test_too_large_value_is_not_stored(self):
+        """Значение больше всего кэша не сохраняется"""
+        self.cache.set('huge', 'x' * 5000)
+        self.assertIsNone(self.cache.get('huge'))
+
+    def test_stats(self):
+        """Статистика считает попадания, промахи и вытеснения"""
+        self.cache.set('key', 'value')
+        self.cache.get('key')
+        self.cache.get('missing')
+        stats = self.cache.get_stats()
+        self.assertEqual(stats['items'], 1)
+        self.assertGreaterEqual(stats['hits'], 1)
+        self.assertGreaterEqual(stats['misses'], 1)
+
+    def test_incr_and_expiry(self):
+        """incr работает атомарно, истёкшие записи не отдаются"""
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter', 5), 6)
+        self.assertEqual(self.cache.get('counter'), 6)
+        self.cache.set('short', 'value', timeout=-1)
+        self.assertIsNone(self.cache.get('short'))
+        with self.assertRaises(ValueError):
+            self.cache.incr('short')
+
+
+class TieredCacheTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.cache_dir = tempfile.mkdtemp()
+        cls.settings = override_settings(CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+            },
+            'local': {
+                'BACKEND': 'yatube.cache_backends.LRUCache',
+                'LOCATION': 'test-tiered-local',
+            },
+            'shared': {
+                'BACKEND':
+                    'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': cls.cache_dir,
+            },
+            'tiered': {
+                'BACKEND': 'yatube.cache_backends.TieredCache',
+                'OPTIONS': {'LOCAL': 'local', 'SHARED': 'shared'},
+            },
+        })
+        cls.settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.settings.disable()
+        shutil.rmtree(cls.cache_dir, ignore_errors=True)
+
+    def setUp(self):
+        self.tiered = caches['tiered']
+        self.tiered.clear()
+
+    def test_write_goes_to_both_tiers(self):
+        """Запись попадает и в локальный, и в общий уровень"""
+        self.tiered.set('key', 'value')
+        self.assertEqual(caches['local'].get('key'), 'value')
+        self.assertEqual(caches['shared'].get('key'), 'value')
+
+    def test_read_through_shared_tier(self):
+        """Промах локального уровня читается из общего и кэшируется"""
+        caches['shared'].set('key', 'from another worker')
+        self.assertIsNone(caches['local'].get('key'))
+        self.assertEqual(self.tiered.get('key'), 'from another worker')
+        self.assertEqual(caches['local'].get('key'), 'from another worker')
+
+    def test_delete_and_incr(self):
+        """Удаление и incr действуют на оба уровня"""
+        self.tiered.set('counter', 1)
+        self.assertEqual(self.tiered.incr('counter'), 2)
+        self.assertEqual(self.tiered.get('counter'), 2)
+        self.tiered.delete('counter')
+        self.assertIsNone(caches['local'].get('counter'))
+        self.assertIsNone(caches['shared'].get('counter'))
@@ -0,0 +1,76 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Post
+from posts.paginators import COMMENTS_PER_PAGE
+
+User = get_user_model()
+
+
+class CommentPagesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.post = Post.objects.create(text='text', author=cls.user)
+        cls.other_post = Post.objects.create(text='other', author=cls.user)
+        # Одинаковое время создания: порядок держится на id
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=User.objects.create_user(
+                username=f'reader{i}'), text=f'comment{i}')
+            for i in range(COMMENTS_PER_PAGE + 5)
+        )
+        Comment.objects.create(post=cls.other_post, author=cls.user,
+                               text='foreign')
+        cls.post_url = reverse('post', args=[cls.user.username, cls.post.pk])
+        cls.comments_url = reverse('post_comments',
+                                   args=[cls.user.username, cls.post.pk])
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_post_shows_first_page(self):
+        """Пост показывает одну страницу комментариев без запроса на автора"""
+        self.guest_client.get(self.post_url)
+        with self.assertNumQueries(3):
+            response = self.guest_client.get(self.post_url)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_PER_PAGE)
+        self.assertContains(response, comments.next_cursor)
+        self.assertNotContains(response, 'foreign')
+
+    def test_json_batches_cover_all_comments(self):
+        """JSON-пачки по курсорам отдают все комментарии поста по разу"""
+        texts = []
+        cursor = None
+        while True:
+            params = {'format': 'json'}
+            if cursor:
+                params['cursor'] = cursor
+            data = self.guest_client.get(self.comments_url, params).json()
+            texts += [comment['text'] for comment in data['comments']]
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(sorted(texts), sorted(
+            Comment.objects.filter(post=CommentPagesTests.post)
+            .values_list('text', flat=True)
+        ))
+
+    def test_fragment(self):
+        """Фрагмент - только комментарии, без разметки страницы"""
+        first = self.guest_client.get(self.post_url).context['comments']
+        response = self.guest_client.get(self.comments_url,
+                                         {'cursor': first.next_cursor})
+        self.assertEqual(len(response.context['comments']), 5)
+        self.assertNotContains(response, '<html')
+        self.assertNotContains(response, 'comments-more')
+
+    def test_unknown_post(self):
+        """Комментарии чужого или несуществующего поста - 404"""
+        url = reverse('post_comments', args=['nobody',
+                                             CommentPagesTests.post.pk])
+        self.assertEqual(self.guest_client.get(url).status_code, 404)
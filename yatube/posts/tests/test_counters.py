@@ -0,0 +1,282 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Max
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import counters
+from posts.forms import PostForm
+from posts.models import Comment, Counter, Follow, Group, Post, UserCounters
+
+User = get_user_model()
+
+
+class PostCountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group1 = Group.objects.create(
+            title='title1',
+            description='description1',
+            slug='test-slug1'
+        )
+        cls.group2 = Group.objects.create(
+            title='title2',
+            description='description2',
+            slug='test-slug2'
+        )
+        cls.user = User.objects.create_user(username='TestUser')
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def value(self, key):
+        return Counter.objects.get(key=key).value
+
+    def test_counters_follow_post_changes(self):
+        """Счётчики меняются при создании, переносе и удалении поста"""
+        post = Post.objects.create(text='text', author=PostCountersTests.user,
+                                   group=PostCountersTests.group1)
+        Post.objects.create(text='text', author=PostCountersTests.user)
+        group1_key = counters.group_posts_key(PostCountersTests.group1.pk)
+        group2_key = counters.group_posts_key(PostCountersTests.group2.pk)
+        self.assertEqual(self.value(counters.ALL_POSTS_KEY), 2)
+        self.assertEqual(self.value(group1_key), 1)
+
+        post = Post.objects.get(pk=post.pk)
+        post.group = PostCountersTests.group2
+        post.save()
+        self.assertEqual(self.value(group1_key), 0)
+        self.assertEqual(self.value(group2_key), 1)
+
+        post.delete()
+        self.assertEqual(self.value(counters.ALL_POSTS_KEY), 1)
+        self.assertEqual(self.value(group2_key), 0)
+
+    def test_missing_counter_is_initialized_from_table(self):
+        """Отсутствующий счётчик один раз считается по таблице"""
+        group = PostCountersTests.group1
+        Post.objects.bulk_create(
+            Post(text=f'text{i}', author=PostCountersTests.user, group=group)
+            for i in range(3)
+        )
+        key = counters.group_posts_key(group.pk)
+        self.assertEqual(counters.get_count(key, group.posts.all()), 3)
+        self.assertEqual(self.value(key), 3)
+
+    def test_feeds_do_not_count_posts(self):
+        """Ленты берут число постов из счётчиков, а не из COUNT(*)"""
+        for i in range(15):
+            Post.objects.create(text=f'text{i}',
+                                author=PostCountersTests.user,
+                                group=PostCountersTests.group1)
+        urls = [
+            reverse('index'),
+            reverse('group_posts', args=[PostCountersTests.group1.slug]),
+            reverse('profile', args=[PostCountersTests.user.username]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as context:
+                    response = self.guest_client.get(url, {'page': 2})
+                self.assertEqual(response.context['page'].paginator.count, 15)
+                self.assertEqual(len(response.context['page']), 5)
+                for query in context:
+                    self.assertNotIn('COUNT(*)', query['sql'])
+
+
+class CommentStatsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.post = Post.objects.create(text='text', author=cls.user)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(CommentStatsTests.user)
+
+    def test_comment_stats_follow_comments(self):
+        """comment_count и last_comment_at следуют за комментариями"""
+        post = CommentStatsTests.post
+        for url in (
+            reverse('post', args=[post.author.username, post.pk]),
+            reverse('add_comment', args=[post.author.username, post.pk]),
+        ):
+            self.authorized_client.post(url, {'text': 'comment'})
+        first, last = Comment.objects.order_by('created')
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 2)
+        self.assertEqual(post.last_comment_at, last.created)
+
+        last.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(post.last_comment_at, first.created)
+
+        first.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+        self.assertIsNone(post.last_comment_at)
+
+    def test_post_delete_skips_comment_stats(self):
+        """Удаление поста не пересчитывает статистику по каждому комментарию"""
+        post = Post.objects.create(text='doomed',
+                                   author=CommentStatsTests.user)
+        Comment.objects.bulk_create(
+            Comment(post=post, author=CommentStatsTests.user, text='comment')
+            for _ in range(5)
+        )
+        with CaptureQueriesContext(connection) as context:
+            post.delete()
+        self.assertFalse(Comment.objects.filter(post_id=post.pk).exists())
+        updates = [query['sql'] for query in context
+                   if query['sql'].startswith('UPDATE "posts_post"')]
+        self.assertEqual(updates, [])
+
+    def test_comment_count_does_not_go_negative(self):
+        """Разошедшийся счётчик не уходит ниже нуля"""
+        post = CommentStatsTests.post
+        comment = Comment.objects.create(post=post,
+                                         author=CommentStatsTests.user,
+                                         text='comment')
+        Post.objects.filter(pk=post.pk).update(comment_count=0)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+
+    def test_edit_keeps_comment_stats(self):
+        """Редактирование поста не затирает comment_count копией из памяти"""
+        post = CommentStatsTests.post
+        held = Post.objects.get(pk=post.pk)
+        comment = Comment.objects.create(post=post,
+                                         author=CommentStatsTests.user,
+                                         text='comment')
+        form = PostForm({'text': 'edited'}, instance=held)
+        self.assertTrue(form.is_valid())
+        form.save()
+        self.authorized_client.post(
+            reverse('post_edit', args=[post.author.username, post.pk]),
+            {'text': 'edited again'},
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'edited again')
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(post.last_comment_at, comment.created)
+
+    def test_rebuild_command(self):
+        """Команда rebuild_comment_stats восстанавливает поля по таблице"""
+        cache.clear()
+        post = CommentStatsTests.post
+        untouched = Post.objects.create(text='без комментариев',
+                                        author=CommentStatsTests.user)
+        guest_client = Client()
+        profile_url = reverse('profile', args=[post.author.username])
+        etag = guest_client.get(profile_url)['ETag']
+        self.assertNotContains(guest_client.get(reverse('index')),
+                               'Комментариев')
+        Comment.objects.bulk_create(
+            Comment(post=post, author=CommentStatsTests.user, text='comment')
+            for _ in range(3)
+        )
+        Post.objects.filter(pk=post.pk).update(comment_count=42)
+        # Время комментария у поста без комментариев - тоже расхождение
+        Post.objects.filter(pk=untouched.pk).update(
+            last_comment_at=timezone.now())
+        output = StringIO()
+        call_command('rebuild_comment_stats', stdout=output)
+        self.assertIn('Обновлено постов: 2', output.getvalue())
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 3)
+        self.assertEqual(
+            post.last_comment_at,
+            Comment.objects.aggregate(last=Max('created'))['last']
+        )
+        untouched.refresh_from_db()
+        self.assertIsNone(untouched.last_comment_at)
+        # Профиль и закэшированная лента показывают исправленное
+        response = guest_client.get(profile_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(guest_client.get(reverse('index')),
+                            'Комментариев: 3')
+        # Повторный запуск ничего не меняет
+        etag = response['ETag']
+        output = StringIO()
+        call_command('rebuild_comment_stats', stdout=output)
+        self.assertIn('Обновлено постов: 0', output.getvalue())
+        response = guest_client.get(profile_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+
+class UserCountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(UserCountersTests.reader)
+
+    def counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_counters_follow_changes(self):
+        """Счётчики меняются при подписке, отписке и публикации"""
+        author = UserCountersTests.author
+        reader = UserCountersTests.reader
+        self.reader_client.post(reverse('profile_follow',
+                                        args=[author.username]))
+        post = Post.objects.create(text='text', author=author)
+        self.assertEqual(
+            (self.counters(author).followers, self.counters(author).posts,
+             self.counters(reader).following), (1, 1, 1)
+        )
+        post.delete()
+        self.reader_client.post(reverse('profile_unfollow',
+                                        args=[author.username]))
+        self.assertEqual(
+            (self.counters(author).followers, self.counters(author).posts,
+             self.counters(reader).following), (0, 0, 0)
+        )
+
+    def test_author_card_reads_counters_with_user(self):
+        """Карточка автора не считает COUNT по подпискам и постам"""
+        author = UserCountersTests.author
+        Follow.objects.create(user=UserCountersTests.reader, author=author)
+        Post.objects.create(text='text', author=author)
+        url = reverse('profile', args=[author.username])
+        with CaptureQueriesContext(connection) as context:
+            response = self.reader_client.get(url)
+        self.assertEqual(response.context['follower_count'], 1)
+        self.assertEqual(response.context['post_count'], 1)
+        # Ни COUNT(*), ни COUNT("posts_post"."id") и прочих агрегатов
+        for query in context:
+            self.assertNotRegex(query['sql'], r'(?i)\b(COUNT|MAX)\(')
+
+    def test_reconcile_command(self):
+        """reconcile_counters чинит разошедшиеся и недостающие счётчики"""
+        author = UserCountersTests.author
+        Post.objects.bulk_create(
+            Post(text=f'text{i}', author=author) for i in range(3)
+        )
+        Follow.objects.bulk_create(
+            [Follow(user=UserCountersTests.reader, author=author)]
+        )
+        UserCounters.objects.filter(user=UserCountersTests.reader).delete()
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('Исправлено счётчиков: 2', out.getvalue())
+        self.assertEqual(
+            (self.counters(author).followers, self.counters(author).posts),
+            (1, 3)
+        )
+        self.assertEqual(self.counters(UserCountersTests.reader).following, 1)
@@ -0,0 +1,79 @@
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from posts.models import Comment, Group, Post, UserCounters
+
+User = get_user_model()
+
+DATASETS = ('users', 'groups', 'posts', 'comments')
+
+
+class ImportExportTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        author = User.objects.create_user(username='Author',
+                                          password='secret',
+                                          first_name='Имя')
+        group = Group.objects.create(title='title', slug='test-slug',
+                                     description='description')
+        self.old = timezone.now() - timedelta(days=365)
+        for i in range(5):
+            post = Post.objects.create(text=f'text{i}', author=author,
+                                       group=group if i % 2 else None)
+            Comment.objects.create(post=post, author=author,
+                                   text=f'comment{i}')
+        Post.objects.update(pub_date=self.old)
+
+    def path(self, dataset, fmt):
+        return os.path.join(self.directory.name, f'{dataset}.{fmt}')
+
+    def round_trip(self, fmt):
+        for dataset in DATASETS:
+            call_command('export_data', dataset, self.path(dataset, fmt),
+                         stderr=StringIO())
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        for dataset in DATASETS:
+            call_command('import_data', dataset, self.path(dataset, fmt),
+                         '--batch-size', '2', stdout=StringIO())
+
+    def test_round_trip(self):
+        """Выгрузка и загрузка восстанавливают данные, даты и счётчики"""
+        for fmt in ('jsonl', 'csv'):
+            with self.subTest(format=fmt):
+                self.round_trip(fmt)
+                author = User.objects.get(username='Author')
+                self.assertEqual(author.first_name, 'Имя')
+                self.assertTrue(author.check_password('secret'))
+                self.assertEqual(Post.objects.filter(
+                    author=author, pub_date=self.old).count(), 5)
+                self.assertEqual(
+                    Post.objects.filter(group__slug='test-slug').count(), 2
+                )
+                self.assertEqual(
+                    list(Post.objects.values_list('comment_count',
+                                                  flat=True)), [1] * 5
+                )
+                self.assertEqual(UserCounters.objects.get(user=author).posts,
+                                 5)
+
+    def test_rows_without_author_are_skipped(self):
+        """Строки с неизвестным автором пропускаются и попадают в отчёт"""
+        path = self.path('posts', 'jsonl')
+        with open(path, 'w', encoding='utf-8') as stream:
+            for author in ('Author', 'nobody'):
+                stream.write(json.dumps({'text': 'new', 'author': author}))
+                stream.write('\n')
+        out = StringIO()
+        call_command('import_data', 'posts', path, stdout=out)
+        self.assertIn('пропущено без автора или поста: 1', out.getvalue())
+        self.assertEqual(Post.objects.filter(text='new').count(), 1)
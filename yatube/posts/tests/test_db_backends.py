@@ -0,0 +1,128 @@
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.db import connection
+from django.test import SimpleTestCase
+
+from yatube.db_backends.sqlite3.base import DatabaseWrapper
+
+try:
+    import psycopg2
+except ImportError:
+    psycopg2 = None
+
+
+class SQLiteBackendTests(SimpleTestCase):
+    def connect(self, **options):
+        settings_dict = {**connection.settings_dict,
+                         'NAME': os.path.join(self.tmp.name, 'db.sqlite3'),
+                         'OPTIONS': options}
+        wrapper = DatabaseWrapper(settings_dict, alias='sqlite_test')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_pragmas(self):
+        """Файловая база открывается в WAL с synchronous=NORMAL"""
+        wrapper = self.connect()
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        # 1 - NORMAL
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 5000)
+        self.assertEqual(self.pragma(wrapper, 'foreign_keys'), 1)
+
+    def test_pragmas_from_options(self):
+        """OPTIONS['pragmas'] переопределяют значения по умолчанию"""
+        wrapper = self.connect(pragmas={'busy_timeout': 100})
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 100)
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+
+    def test_reader_sees_last_commit_during_write(self):
+        """Чтение идёт, пока другая транзакция держит запись"""
+        writer, reader = self.connect(), self.connect()
+        with writer.cursor() as cursor:
+            cursor.execute('CREATE TABLE t (id integer)')
+            cursor.execute('INSERT INTO t VALUES (1)')
+        writer.set_autocommit(False)
+        with writer.cursor() as cursor:
+            cursor.execute('INSERT INTO t VALUES (2)')
+        with reader.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM t')
+            self.assertEqual(cursor.fetchone()[0], 1)
+        writer.rollback()
+        writer.set_autocommit(True)
+
+
+class DatabaseSettingsTests(SimpleTestCase):
+    def import_settings(self, **environ):
+        return subprocess.run(
+            [sys.executable, '-c', 'import yatube.settings'],
+            cwd=settings.BASE_DIR, env={**os.environ, **environ},
+            capture_output=True, text=True,
+        )
+
+    def test_unknown_engine(self):
+        """Неизвестный YATUBE_DB - ImproperlyConfigured со списком"""
+        result = self.import_settings(YATUBE_DB='mysql')
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn('ImproperlyConfigured', result.stderr)
+        self.assertIn('sqlite, postgresql', result.stderr)
+
+    def test_unknown_pool(self):
+        """Неизвестный YATUBE_DB_POOL - ImproperlyConfigured со списком"""
+        result = self.import_settings(YATUBE_DB_POOL='pgpool')
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn('internal, pgbouncer', result.stderr)
+
+
+@skipUnless(psycopg2, 'psycopg2 is not installed')
+class PostgreSQLPoolTests(SimpleTestCase):
+    conn_params = {'dbname': 'yatube', 'host': 'db'}
+
+    def setUp(self):
+        from yatube.db_backends.postgresql import base
+        self.base = base
+        # Без сервера: пул psycopg2 заменён заглушкой
+        patcher = mock.patch.object(base.pg_pool, 'ThreadedConnectionPool')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(base._pools.clear)
+        base._pools.clear()
+
+    def test_pool_per_process(self):
+        """После fork процесс получает свой пул"""
+        pool = self.base._get_pool('default', self.conn_params, {})
+        self.assertIs(self.base._get_pool('default', self.conn_params, {}),
+                      pool)
+        with mock.patch.object(self.base.os, 'getpid',
+                               return_value=os.getpid() + 1):
+            child = self.base._get_pool('default', self.conn_params, {})
+        self.assertIsNot(child, pool)
+
+    def test_pool_per_database(self):
+        """Тестовая база - другой пул"""
+        pool = self.base._get_pool('default', self.conn_params, {})
+        test_params = {**self.conn_params, 'dbname': 'test_yatube'}
+        self.assertIsNot(self.base._get_pool('default', test_params, {}),
+                         pool)
+
+    def test_waits_for_free_connection(self):
+        """Пустой пул ждёт timeout и отвечает OperationalError"""
+        pool = self.base._Pool(self.conn_params, max_size=1, timeout=0.01)
+        connection = pool.get()
+        with self.assertRaises(psycopg2.OperationalError):
+            pool.get()
+        pool.put(connection)
+        pool.get()
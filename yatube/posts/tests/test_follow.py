@@ -0,0 +1,140 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Follow, Post, TimelineEntry
+from posts.timeline import TimelinePaginator
+
+User = get_user_model()
+
+
+# Раскладка идёт после коммита, поэтому транзакции настоящие
+@override_settings(FANOUT_WORKERS=0)
+class FollowTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        FollowTests.author = User.objects.create_user(username='Author')
+        FollowTests.reader = User.objects.create_user(username='Reader')
+        FollowTests.stranger = User.objects.create_user(username='Stranger')
+        self.reader_client = Client()
+        self.reader_client.force_login(FollowTests.reader)
+        self.stranger_client = Client()
+        self.stranger_client.force_login(FollowTests.stranger)
+
+    def follow(self, client, author):
+        client.post(reverse('profile_follow', args=[author.username]))
+
+    def unfollow(self, client, author):
+        client.post(reverse('profile_unfollow', args=[author.username]))
+
+    def feed(self, client):
+        response = client.get(reverse('follow_index'))
+        return [entry.post.text for entry in response.context['page']]
+
+    def test_follow_and_unfollow(self):
+        """Подписка и отписка меняют карточку автора, на себя нельзя"""
+        self.follow(self.reader_client, FollowTests.author)
+        self.follow(self.reader_client, FollowTests.author)
+        self.follow(self.reader_client, FollowTests.reader)
+        self.assertEqual(Follow.objects.count(), 1)
+        response = self.reader_client.get(
+            reverse('profile', args=[FollowTests.author.username]))
+        self.assertContains(response, 'Подписчиков: 1')
+        self.assertContains(response, 'Отписаться')
+        self.unfollow(self.reader_client, FollowTests.author)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_follow_requires_post_with_csrf(self):
+        """GET не подписывает, POST без CSRF-токена отклоняется"""
+        url = reverse('profile_follow', args=[FollowTests.author.username])
+        self.assertEqual(self.reader_client.get(url).status_code, 405)
+        csrf_client = Client(enforce_csrf_checks=True)
+        csrf_client.force_login(FollowTests.reader)
+        self.assertEqual(csrf_client.post(url).status_code, 403)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_new_post_is_fanned_out(self):
+        """Новый пост попадает только в ленты подписчиков"""
+        self.follow(self.reader_client, FollowTests.author)
+        Post.objects.create(text='fresh', author=FollowTests.author)
+        self.assertEqual(self.feed(self.reader_client), ['fresh'])
+        self.assertEqual(self.feed(self.stranger_client), [])
+
+    def test_follow_backfills_and_unfollow_cleans(self):
+        """Подписка подтягивает старые посты, отписка их убирает"""
+        Post.objects.create(text='old', author=FollowTests.author)
+        self.follow(self.reader_client, FollowTests.author)
+        self.assertEqual(self.feed(self.reader_client), ['old'])
+        self.unfollow(self.reader_client, FollowTests.author)
+        self.assertEqual(self.feed(self.reader_client), [])
+
+    @override_settings(FANOUT_FOLLOWER_LIMIT=1)
+    def test_pull_for_popular_authors(self):
+        """Посты популярного автора подмешиваются при чтении без дублей"""
+        Post.objects.create(text='before', author=FollowTests.author)
+        self.follow(self.reader_client, FollowTests.author)
+        self.follow(self.stranger_client, FollowTests.author)
+        Post.objects.create(text='after', author=FollowTests.author)
+        self.assertFalse(TimelineEntry.objects.filter(
+            post__text='after').exists())
+        self.assertEqual(self.feed(self.reader_client), ['after', 'before'])
+        self.assertEqual(self.feed(self.stranger_client), ['after', 'before'])
+
+    @override_settings(FANOUT_FOLLOWER_LIMIT=1)
+    def test_author_back_under_limit_is_pushed_again(self):
+        """Автор снова под лимитом: следующий пост раскладывается"""
+        self.follow(self.reader_client, FollowTests.author)
+        self.follow(self.stranger_client, FollowTests.author)
+        Post.objects.create(text='pulled', author=FollowTests.author)
+        self.unfollow(self.stranger_client, FollowTests.author)
+        Post.objects.create(text='pushed', author=FollowTests.author)
+        self.assertFalse(Follow.objects.filter(pull=True).exists())
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(
+                user=FollowTests.reader).values_list('post__text',
+                                                     flat=True)),
+            {'pulled', 'pushed'},
+        )
+        self.assertEqual(self.feed(self.reader_client), ['pushed', 'pulled'])
+
+    def test_publish_reads_follower_counter(self):
+        """Публикация не считает подписчиков COUNT по Follow"""
+        self.follow(self.reader_client, FollowTests.author)
+        with CaptureQueriesContext(connection) as context:
+            Post.objects.create(text='fresh', author=FollowTests.author)
+        for query in context:
+            self.assertNotRegex(query['sql'], r'COUNT\(.*"posts_follow"')
+        self.assertEqual(self.feed(self.reader_client), ['fresh'])
+
+    def test_feed_is_single_range_scan(self):
+        """Лента - один запрос по индексу, курсоры обходят её целиком"""
+        self.follow(self.reader_client, FollowTests.author)
+        for i in range(15):
+            Post.objects.create(text=f'post{i}', author=FollowTests.author)
+        paginator = TimelinePaginator(FollowTests.reader, 10)
+        # Лента + список авторов, читаемых при открытии (pull)
+        with self.assertNumQueries(2):
+            page = paginator.page()
+            [entry.post.author.username for entry in page]
+        second = paginator.page(page.next_cursor)
+        self.assertEqual(len(page) + len(second), 15)
+        self.assertFalse(second.has_next())
+        sql, params = paginator.object_list.filter(
+            user=FollowTests.reader).order_by(
+            *paginator.ordering)[:11].query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('timeline_user_pub_date_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_follow_changes_etag(self):
+        """Подписка меняет ETag профиля"""
+        url = reverse('profile', args=[FollowTests.author.username])
+        etag = self.stranger_client.get(url)['ETag']
+        self.follow(self.reader_client, FollowTests.author)
+        response = self.stranger_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,196 @@
+import base64
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import counters
+from posts.models import Counter, Group, Post
+from posts.paginators import (CursorPage, CursorPaginator, FeedPaginator,
+                              NEXT, encode_cursor)
+
+User = get_user_model()
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='title',
+            description='description',
+            slug='test-slug'
+        )
+        cls.user = User.objects.create_user(username='TestUser')
+        # bulk_create даёт постам одинаковое время публикации,
+        # порядок внутри таких пачек держится только на id
+        Post.objects.bulk_create(
+            Post(text=f'text{i}', author=cls.user, group=cls.group)
+            for i in range(25)
+        )
+        # bulk_create идёт мимо сигналов - счётчики автора сверяем сами
+        counters.rebuild_user_counters(User.objects.filter(pk=cls.user.pk))
+        cls.expected = list(
+            Post.objects.order_by('-pub_date', 'id').values_list('pk',
+                                                                 flat=True)
+        )
+        cls.feeds = [
+            reverse('index'),
+            reverse('group_posts', args=[cls.group.slug]),
+            reverse('profile', args=[cls.user.username]),
+        ]
+
+    def setUp(self):
+        # Гостевые страницы кэшируются целиком, а тестам нужен context
+        cache.clear()
+        self.guest_client = Client()
+
+    def walk(self, url):
+        pages = []
+        response = self.guest_client.get(url)
+        pages.append(response.context['page'])
+        while pages[-1].has_next():
+            response = self.guest_client.get(
+                url, {'cursor': pages[-1].next_cursor}
+            )
+            pages.append(response.context['page'])
+        return pages
+
+    def test_cursor_pages_cover_feed(self):
+        """Переход по курсорам проходит всю ленту без пропусков и повторов"""
+        for url in CursorPaginatorTests.feeds:
+            with self.subTest(url=url):
+                pages = self.walk(url)
+                self.assertEqual([len(page) for page in pages], [10, 10, 5])
+                self.assertEqual(
+                    [post.pk for page in pages for post in page],
+                    CursorPaginatorTests.expected
+                )
+                self.assertIsInstance(pages[-1], CursorPage)
+                self.assertFalse(pages[-1].has_next())
+
+    def test_previous_cursor(self):
+        """Курсор назад возвращает предыдущую страницу"""
+        url = reverse('index')
+        pages = self.walk(url)
+        response = self.guest_client.get(
+            url, {'cursor': pages[-1].previous_cursor}
+        )
+        page = response.context['page']
+        self.assertEqual([post.pk for post in page],
+                         CursorPaginatorTests.expected[10:20])
+        response = self.guest_client.get(
+            url, {'cursor': page.previous_cursor}
+        )
+        page = response.context['page']
+        self.assertEqual([post.pk for post in page],
+                         CursorPaginatorTests.expected[:10])
+        self.assertFalse(page.has_previous())
+
+    def test_offset_page_links_to_cursor(self):
+        """Страница ?page=N отдаёт курсоры соседних страниц"""
+        url = reverse('index')
+        page = self.guest_client.get(url, {'page': 2}).context['page']
+        self.assertEqual(page.number, 2)
+        response = self.guest_client.get(url, {'cursor': page.next_cursor})
+        self.assertEqual([post.pk for post in response.context['page']],
+                         CursorPaginatorTests.expected[20:])
+        self.assertContains(response, '?cursor=')
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Испорченный курсор открывает первую страницу"""
+        for cursor in ('', 'garbage', '!!!', 'WyJ4IiwxXQ'):
+            with self.subTest(cursor=cursor):
+                response = self.guest_client.get(reverse('index'),
+                                                 {'cursor': cursor})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    [post.pk for post in response.context['page']],
+                    CursorPaginatorTests.expected[:10]
+                )
+
+    def test_null_cursor_returns_first_page(self):
+        """Курсор с null или списком в ключах открывает первую страницу"""
+        for values in ([None, 1], [None, None], [[1], 1], [{}, 1],
+                       [True, 1]):
+            cursor = base64.urlsafe_b64encode(
+                json.dumps([NEXT, *values]).encode()).decode()
+            for url in (*CursorPaginatorTests.feeds,
+                        reverse('api_v1:posts')):
+                with self.subTest(values=values, url=url):
+                    cache.clear()
+                    response = self.guest_client.get(url, {'cursor': cursor})
+                    self.assertEqual(response.status_code, 200)
+
+    def test_deep_cursor_costs_same_as_first_page(self):
+        """Запрос по курсору не зависит от глубины страницы"""
+        paginator = CursorPaginator(Post.objects.for_feed(), 10)
+        last = Post.objects.get(pk=CursorPaginatorTests.expected[-6])
+        with CaptureQueriesContext(connection) as first:
+            list(paginator.page())
+        with CaptureQueriesContext(connection) as deep:
+            list(paginator.page(encode_cursor(NEXT, last)))
+        self.assertEqual(len(first), len(deep))
+        self.assertNotIn('OFFSET', deep[0]['sql'])
+
+    def feed_with_counter(self, value):
+        Counter.objects.update_or_create(key=counters.ALL_POSTS_KEY,
+                                         defaults={'value': value})
+        return FeedPaginator(Post.objects.all(), 10,
+                             counter_key=counters.ALL_POSTS_KEY)
+
+    def test_counter_behind_table(self):
+        """Отставший счётчик не прячет записи последней страницы"""
+        paginator = self.feed_with_counter(15)
+        self.assertTrue(paginator.get_page(2).has_next())
+        page = paginator.get_page(3)
+        self.assertEqual(
+            [post.pk for post in page], CursorPaginatorTests.expected[20:]
+        )
+        self.assertFalse(page.has_next())
+        self.assertEqual(paginator.count, 25)
+
+    def test_counter_ahead_of_table(self):
+        """За последней страницей нет пустых, если счётчик завышен"""
+        paginator = self.feed_with_counter(40)
+        page = paginator.get_page(4)
+        self.assertEqual(page.number, 3)
+        self.assertEqual(len(page), 5)
+        self.assertFalse(page.has_next())
+        self.assertEqual(paginator.num_pages, 3)
+
+    def test_page_past_end_with_counter_too_high(self):
+        """Завышенный счётчик: страница за концом - последняя, не 500"""
+        for number in (4, 5, 8, 10):
+            with self.subTest(page=number):
+                cache.clear()
+                self.feed_with_counter(100)
+                response = self.guest_client.get(reverse('index'),
+                                                 {'page': number})
+                self.assertEqual(response.status_code, 200)
+                page = response.context['page']
+                self.assertEqual(page.number, 3)
+                self.assertEqual(
+                    [post.pk for post in page],
+                    CursorPaginatorTests.expected[20:]
+                )
+                self.assertFalse(page.has_next())
+                self.assertEqual(
+                    Counter.objects.get(key=counters.ALL_POSTS_KEY).value, 25
+                )
+
+    def test_page_past_counter_with_counter_too_low(self):
+        """Отставший счётчик: страница за его концом открывается"""
+        self.feed_with_counter(5)
+        response = self.guest_client.get(reverse('index'), {'page': 3})
+        page = response.context['page']
+        self.assertEqual(page.number, 3)
+        self.assertEqual([post.pk for post in page],
+                         CursorPaginatorTests.expected[20:])
+        self.assertEqual(
+            Counter.objects.get(key=counters.ALL_POSTS_KEY).value, 25
+        )
@@ -0,0 +1,101 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class FeedQueriesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='title',
+            description='description',
+            slug='test-slug'
+        )
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.commentator = User.objects.create_user(username='Commentator')
+        cls.feeds = [
+            reverse('index'),
+            reverse('group_posts', args=[cls.group.slug]),
+            reverse('profile', args=[cls.user.username]),
+        ]
+
+    def setUp(self):
+        # Гостевые страницы кэшируются целиком, а тестам нужен context
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(FeedQueriesTests.user)
+
+    def create_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(
+                text=f'text{i}',
+                author=FeedQueriesTests.user,
+                group=FeedQueriesTests.group,
+            )
+            Comment.objects.create(
+                post=post,
+                author=FeedQueriesTests.commentator,
+                text=f'comment{i}',
+            )
+
+    def count_queries(self, client, url):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_feed_queries_do_not_depend_on_page_size(self):
+        """Число запросов ленты не растёт вместе с числом постов"""
+        self.create_posts(1)
+        for client in (self.guest_client, self.authorized_client):
+            expected = {
+                url: self.count_queries(client, url)
+                for url in FeedQueriesTests.feeds
+            }
+            self.create_posts(9)
+            for url, queries in expected.items():
+                with self.subTest(url=url):
+                    self.assertEqual(self.count_queries(client, url), queries)
+            Post.objects.all().delete()
+            self.create_posts(1)
+
+    def test_feed_queries_count(self):
+        """Лента из 10 постов укладывается в фиксированное число запросов"""
+        self.create_posts(10)
+        # счётчик для паджинатора + выборка страницы, для группы ещё один
+        # запрос за самим объектом; профиль берёт счётчики вместе с
+        # пользователем, но вдобавок проверяет свежесть для ETag
+        expected = {
+            FeedQueriesTests.feeds[0]: 2,
+            FeedQueriesTests.feeds[1]: 3,
+            FeedQueriesTests.feeds[2]: 3,
+        }
+        for url, queries in expected.items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(queries):
+                    self.guest_client.get(url)
+
+    def test_feed_shows_comments_count(self):
+        """Карточка поста выводит число комментариев из самого поста"""
+        self.create_posts(1)
+        response = self.guest_client.get(reverse('index'))
+        post = response.context['page'][0]
+        self.assertEqual(post.comment_count, 1)
+        self.assertContains(response, 'Комментариев: 1')
+
+    def test_feed_queries_use_indexes(self):
+        """Запросы лент идут по индексам (команда explain_feeds)"""
+        self.create_posts(1)
+        call_command('explain_feeds', stdout=StringIO())
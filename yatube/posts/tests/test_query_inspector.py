@@ -0,0 +1,106 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.template import engines
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post
+from yatube.queries import QueryInspector, inspect_queries, normalize
+
+User = get_user_model()
+
+
+class QueryInspectorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        for i in range(5):
+            post = Post.objects.create(text=f'text{i}', author=cls.user)
+            Comment.objects.create(post=post, author=cls.user, text='c')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_normalize(self):
+        """Литералы и параметры заменяются, списки IN сворачиваются"""
+        self.assertEqual(
+            normalize('SELECT "a"."id" FROM "a"\n WHERE "a"."id" IN '
+                      "(%s, %s, %s) AND \"a\".\"t\" = 'x''y' LIMIT 21"),
+            'SELECT "a"."id" FROM "a" WHERE "a"."id" IN (...) '
+            'AND "a"."t" = ? LIMIT ?',
+        )
+        self.assertEqual(normalize('SELECT 1 FROM "t2" WHERE "id" IN (%s)'),
+                         'SELECT ? FROM "t2" WHERE "id" IN (...)')
+
+    def test_repeats_point_to_template_line(self):
+        """N+1 из шаблона указывает строку шаблона и строку кода"""
+        template = engines['django'].from_string(
+            '{% for post in posts %}\n{{ post.comments.count }}\n'
+            '{% endfor %}'
+        )
+        posts = list(Post.objects.all())
+        with inspect_queries() as inspector:
+            template.render({'posts': posts})
+        [shape] = inspector.repeated()
+        self.assertEqual(shape.count, 5)
+        self.assertIn('COUNT(*)', shape.sql)
+        self.assertIn(':2', shape.origin)
+        self.assertIn('posts/tests/test_query_inspector.py', shape.origin)
+        with self.assertRaisesRegex(AssertionError, 'N\\+1'):
+            inspector.assert_no_repeats()
+
+    def test_feeds_have_no_repeats(self):
+        """Ни одна страница ленты не повторяет запрос на каждый пост"""
+        urls = [reverse('index'), reverse('profile', args=['TestUser'])]
+        for url in urls:
+            with self.subTest(url=url), inspect_queries() as inspector:
+                self.guest_client.get(url)
+                inspector.assert_no_repeats()
+
+    @override_settings(SLOW_QUERY_MS=0, NPLUSONE_THRESHOLD=1,
+                       QUERY_INSPECTOR_SAMPLE_RATE=1)
+    def test_middleware_logs(self):
+        """Middleware пишет медленные запросы и повторы в лог"""
+        with self.assertLogs('yatube.queries', 'WARNING') as logs:
+            self.guest_client.get(reverse('index'))
+        output = '\n'.join(logs.output)
+        self.assertIn('Slow query', output)
+        self.assertIn('N+1 in GET /', output)
+
+    def test_writes_are_not_repeats(self):
+        """Транзакции и UPDATE не считаются N+1, только чтения"""
+        inspector = QueryInspector(slow_ms=1000)
+
+        def execute(sql, params, many, context):
+            return None
+
+        for sql in ('BEGIN', 'SAVEPOINT "s1_x1"', 'RELEASE SAVEPOINT "s1_x1"',
+                    'UPDATE "posts_counter" SET "value" = ("value" + 1)'):
+            for _ in range(5):
+                inspector(execute, sql, None, False, {})
+        self.assertEqual(inspector.repeated(2), [])
+        self.assertEqual(inspector.queries, 20)
+
+    @override_settings(NPLUSONE_THRESHOLD=2, QUERY_INSPECTOR_SAMPLE_RATE=1)
+    def test_creating_post_logs_no_repeats(self):
+        """Создание и правка поста не дают предупреждений о N+1"""
+        group = Group.objects.create(title='title', slug='slug',
+                                     description='description')
+        client = Client()
+        client.force_login(QueryInspectorTests.user)
+        with self.assertNoLogs('yatube.queries', 'WARNING'):
+            client.post(reverse('new_post'),
+                        {'text': 'new', 'group': group.pk})
+            post = Post.objects.latest('pk')
+            client.post(reverse('post_edit', args=['TestUser', post.pk]),
+                        {'text': 'edited', 'group': group.pk})
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'edited')
+
+    @override_settings(NPLUSONE_THRESHOLD=1, QUERY_INSPECTOR_SAMPLE_RATE=0)
+    def test_middleware_samples(self):
+        """Вне выборки формы не разбираются"""
+        with self.assertNoLogs('yatube.queries', 'WARNING'):
+            self.guest_client.get(reverse('index'))
@@ -0,0 +1,102 @@
+import base64
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Group, Post
+from posts.search import fts_query, search_posts
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.other = User.objects.create_user(username='Other')
+        cls.group = Group.objects.create(title='title', slug='group',
+                                         description='description')
+
+    def setUp(self):
+        self.client = Client()
+
+    def found(self, query, **params):
+        response = self.client.get(reverse('search'), {'q': query, **params})
+        return [post.text for post in response.context['page']]
+
+    def test_words_and_prefix(self):
+        """Ищутся все слова без учёта регистра, последнее - по префиксу"""
+        Post.objects.create(text='Летний Пейзаж у реки', author=self.author)
+        Post.objects.create(text='Зимний пейзаж', author=self.author)
+        self.assertEqual(self.found('пейзаж летн'), ['Летний Пейзаж у реки'])
+        self.assertEqual(len(self.found('ПЕЙЗАЖ')), 2)
+        self.assertEqual(self.found('осень'), [])
+
+    def test_ranking(self):
+        """Выше тот пост, где слово встречается чаще"""
+        Post.objects.create(text='кот спит дома весь день',
+                            author=self.author)
+        Post.objects.create(text='кот, кот и ещё кот дома',
+                            author=self.author)
+        self.assertEqual(self.found('кот')[0], 'кот, кот и ещё кот дома')
+
+    def test_filters(self):
+        """Поиск фильтруется по группе и автору"""
+        Post.objects.create(text='новости группы', author=self.author,
+                            group=self.group)
+        Post.objects.create(text='новости автора', author=self.author)
+        Post.objects.create(text='новости другого', author=self.other)
+        self.assertEqual(self.found('новости', group='group'),
+                         ['новости группы'])
+        self.assertEqual(len(self.found('новости', author='Author')), 2)
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при правке, update() и удалении"""
+        post = Post.objects.create(text='старый текст', author=self.author)
+        post.text = 'новый текст'
+        post.save()
+        self.assertEqual(self.found('старый'), [])
+        Post.objects.filter(pk=post.pk).update(text='другой текст')
+        self.assertEqual(self.found('другой'), ['другой текст'])
+        post.delete()
+        self.assertEqual(self.found('текст'), [])
+
+    def test_keyset_pagination(self):
+        """Курсоры проходят все результаты без повторов"""
+        Post.objects.bulk_create([
+            Post(text=f'слово {"слово " * (i % 4)}{i}', author=self.author)
+            for i in range(25)
+        ])
+        response = self.client.get(reverse('search'), {'q': 'слово'})
+        page = response.context['page']
+        # Ссылка на следующую страницу сохраняет запрос
+        self.assertContains(response, f'?q=%D1%81%D0%BB%D0%BE%D0%B2%D0%BE'
+                                      f'&amp;cursor={page.next_cursor}')
+        seen = [post.pk for post in page]
+        while page.has_next():
+            page = self.client.get(reverse('search'), {
+                'q': 'слово', 'cursor': page.next_cursor,
+            }).context['page']
+            seen.extend(post.pk for post in page)
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+
+    def test_bad_rank_in_cursor_returns_first_page(self):
+        """Не число в rank курсора - первая страница, а не 500"""
+        Post.objects.create(text='слово', author=self.author)
+        for rank in ('abc', [1], {'rank': 1}, None):
+            cursor = base64.urlsafe_b64encode(
+                json.dumps(['n', rank, 5]).encode()).decode()
+            with self.subTest(rank=rank):
+                self.assertEqual(self.found('слово', cursor=cursor),
+                                 ['слово'])
+
+    def test_user_input_is_not_fts_syntax(self):
+        """Операторы FTS5 во вводе не ломают запрос"""
+        Post.objects.create(text='кот OR пёс', author=self.author)
+        self.assertEqual(fts_query('"кот" OR NEAR(*'), '"кот" "or" "near"*')
+        self.assertEqual(list(search_posts('*"(')), [])
+        self.assertEqual(self.found('"кот" OR'), ['кот OR пёс'])
@@ -0,0 +1,119 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+
+from posts.models import Counter, Post, media_lock_key
+
+User = get_user_model()
+
+
+def image_bytes(color='red'):
+    buffer = BytesIO()
+    Image.new('RGB', (20, 20), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class ContentAddressedStorageTests(TransactionTestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        media_settings = override_settings(MEDIA_ROOT=self.media_root,
+                                           THUMBNAIL_WORKERS=0)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.author = User.objects.create_user(username='Author')
+
+    def create_post(self, content, name='picture.png'):
+        return Post.objects.create(
+            text='text', author=self.author,
+            image=SimpleUploadedFile(name, content),
+        )
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(self.media_root, name))
+
+    def test_same_upload_is_stored_once(self):
+        """Одинаковые загрузки хранятся одним файлом"""
+        first = self.create_post(image_bytes(), 'one.png')
+        second = self.create_post(image_bytes(), 'two.png')
+        other = self.create_post(image_bytes('blue'), 'one.png')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image.name, other.image.name)
+        self.assertRegex(first.image.name, r'^posts/\w{2}/\w{64}\.png$')
+
+    def test_file_is_removed_with_last_reference(self):
+        """Файл удаляется вместе с последним ссылающимся постом"""
+        first = self.create_post(image_bytes())
+        second = self.create_post(image_bytes())
+        name = first.image.name
+        first.delete()
+        self.assertTrue(self.exists(name))
+        second.delete()
+        self.assertFalse(self.exists(name))
+
+    def test_replaced_image_is_released(self):
+        """Заменённая картинка удаляется, если больше не нужна"""
+        post = self.create_post(image_bytes())
+        name = post.image.name
+        post.image = SimpleUploadedFile('new.png', image_bytes('blue'))
+        post.save()
+        self.assertFalse(self.exists(name))
+        self.assertTrue(self.exists(post.image.name))
+
+    def test_reuse_and_release_share_lock(self):
+        """Загрузка и удаление файла идут под блокировкой его содержимого"""
+        first = self.create_post(image_bytes())
+        lock = Counter.objects.filter(key=media_lock_key(first.image.name))
+        with CaptureQueriesContext(connection) as context:
+            self.create_post(image_bytes())
+        sql = [query['sql'] for query in context]
+        locked = next(i for i, query in enumerate(sql)
+                      if 'UPDATE "posts_counter"' in query)
+        inserted = next(i for i, query in enumerate(sql)
+                        if query.startswith('INSERT INTO "posts_post"'))
+        self.assertLess(locked, inserted)
+        value = lock.get().value
+        Post.objects.exclude(pk=first.pk).delete()
+        self.assertEqual(lock.get().value, value + 1)
+        self.assertTrue(self.exists(first.image.name))
+        # С последней ссылкой уходит и строка блокировки
+        first.delete()
+        self.assertFalse(lock.exists())
+
+    def test_unrelated_uploads_use_own_locks(self):
+        """Разные картинки блокируются по отдельности"""
+        red = self.create_post(image_bytes())
+        blue = self.create_post(image_bytes('blue'))
+        self.assertNotEqual(media_lock_key(red.image.name),
+                            media_lock_key(blue.image.name))
+        self.assertEqual(Counter.objects.filter(
+            key__startswith='media-lock:').count(), 2)
+
+    def test_dedup_media_command(self):
+        """Команда сливает старые копии одной картинки"""
+        names = [default_storage.save(f'posts/copy{i}.png',
+                                      ContentFile(image_bytes()))
+                 for i in range(2)]
+        posts = [Post.objects.create(text='text', author=self.author)
+                 for _ in names]
+        for post, name in zip(posts, names):
+            Post.objects.filter(pk=post.pk).update(image=name)
+        call_command('dedup_media', stdout=StringIO())
+        images = {post.image.name for post in Post.objects.all()}
+        self.assertEqual(len(images), 1)
+        self.assertTrue(self.exists(images.pop()))
+        for name in names:
+            self.assertFalse(self.exists(name))
+        self.assertTrue(all(post.variants for post in Post.objects.all()))
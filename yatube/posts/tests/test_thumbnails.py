@@ -0,0 +1,136 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+from PIL import Image
+
+from posts.models import Post
+from posts.thumbnails import (THUMBNAIL_SIZE, attach_variants,
+                              generate_thumbnail)
+
+User = get_user_model()
+
+
+def make_image(name='picture.png', size=(40, 30)):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(),
+                              content_type='image/png')
+
+
+class ThumbnailTestMixin:
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        cls.media_settings = override_settings(MEDIA_ROOT=cls.media_root,
+                                               THUMBNAIL_WORKERS=0)
+        cls.media_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media_settings.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    def assertThumbnail(self, post):
+        self.assertTrue(post.thumbnail)
+        with Image.open(post.thumbnail.path) as thumbnail:
+            self.assertEqual(thumbnail.size, THUMBNAIL_SIZE)
+            self.assertEqual(thumbnail.format, 'JPEG')
+
+
+class ThumbnailTests(ThumbnailTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='Author')
+        self.post = Post.objects.create(text='text', author=self.author,
+                                        image=make_image())
+
+    def test_generate_thumbnail(self):
+        """Миниатюра кадрируется под карточку и попадает в ленту"""
+        self.assertTrue(generate_thumbnail(self.post.pk,
+                                           self.post.image.name))
+        self.post.refresh_from_db()
+        self.assertThumbnail(self.post)
+        response = Client().get(reverse('index'))
+        self.assertContains(response, self.post.thumbnail.url)
+        self.assertContains(response, '<source type="image/webp"')
+
+    def test_variant_widths(self):
+        """Варианты не растягиваются шире оригинала, кроме базового"""
+        post = Post.objects.create(text='wide', author=self.author,
+                                   image=make_image('wide.png', (1000, 400)))
+        generate_thumbnail(post.pk, post.image.name)
+        post.refresh_from_db()
+        variants = post.image_variants
+        self.assertIn('webp', variants)
+        self.assertEqual(sorted(variants['jpeg']), ['480', '960'])
+        with Image.open(post.thumbnail.storage.path(
+                variants['webp']['480'])) as image:
+            self.assertEqual(image.size, (480, 170))
+            self.assertEqual(image.format, 'WEBP')
+
+    def test_replaced_image_is_skipped(self):
+        """Миниатюра устаревшей картинки не сохраняется"""
+        self.assertFalse(attach_variants(
+            self.post.pk, 'posts/old.png',
+            {'jpeg': {960: 'posts/thumbs/old_960x339.jpg'}}
+        ))
+        self.post.refresh_from_db()
+        self.assertFalse(self.post.thumbnail)
+
+    def test_full_save_keeps_attached_variants(self):
+        """Сохранение загруженного раньше поста не затирает миниатюру"""
+        held = Post.objects.get(pk=self.post.pk)
+        generate_thumbnail(self.post.pk, self.post.image.name)
+        held.text = 'edited'
+        held.save()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.text, 'edited')
+        self.assertThumbnail(self.post)
+        self.assertTrue(self.post.variants)
+
+    def test_backfill_command(self):
+        """Команда готовит миниатюры для всех постов с картинками"""
+        Post.objects.create(text='no image', author=self.author)
+        call_command('build_thumbnails', workers=2, stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertThumbnail(self.post)
+
+
+class ThumbnailOnSaveTests(ThumbnailTestMixin, TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='Author')
+        self.client.force_login(self.author)
+
+    def test_new_post_and_edit(self):
+        """Миниатюра готовится после new_post и пересоздаётся в post_edit"""
+        self.client.post(reverse('new_post'),
+                         {'text': 'text', 'image': make_image()})
+        post = Post.objects.get()
+        self.assertThumbnail(post)
+        self.client.post(
+            reverse('post_edit', args=[self.author.username, post.pk]),
+            {'text': 'text', 'image': make_image('other.png', (2000, 100))}
+        )
+        edited = Post.objects.get()
+        self.assertNotEqual(edited.thumbnail.name, post.thumbnail.name)
+        self.assertThumbnail(edited)
+        # Файлы прежней картинки больше никому не нужны
+        storage = post.thumbnail.storage
+        old_files = [post.image.name, *(
+            name for widths in post.image_variants.values()
+            for name in widths.values()
+        )]
+        for name in old_files:
+            self.assertFalse(storage.exists(name), name)
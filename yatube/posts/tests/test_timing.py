@@ -0,0 +1,65 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.template import engines
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post
+from yatube.timing import TimedDjangoTemplates, histograms
+
+User = get_user_model()
+
+
+class TimingMiddlewareTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.staff = User.objects.create_user(username='Staff',
+                                             is_staff=True)
+        Post.objects.create(text='text', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        histograms.clear()
+        self.guest_client = Client()
+
+    def metrics(self, response):
+        return {
+            match[0]: (float(match[1]), match[2])
+            for match in re.findall(r'(\w+);dur=([\d.]+)(?:;desc="([^"]*)")?',
+                                    response['Server-Timing'])
+        }
+
+    def test_server_timing(self):
+        """Server-Timing: общее время, view, SQL с числом запросов, шаблоны"""
+        with CaptureQueriesContext(connection) as context:
+            response = self.guest_client.get(
+                reverse('profile', args=[TimingMiddlewareTests.user.username])
+            )
+        metrics = self.metrics(response)
+        self.assertEqual(set(metrics), {'total', 'view', 'sql', 'template'})
+        self.assertEqual(metrics['sql'][1], f'{len(context)} queries')
+        self.assertLessEqual(metrics['view'][0], metrics['total'][0])
+        self.assertLessEqual(metrics['template'][0], metrics['view'][0])
+
+    def test_staff_endpoint(self):
+        """Гистограммы по view видны только staff"""
+        for _ in range(3):
+            self.guest_client.get(reverse('index'))
+        url = reverse('timings')
+        self.assertEqual(self.guest_client.get(url).status_code, 302)
+        staff_client = Client()
+        staff_client.force_login(TimingMiddlewareTests.staff)
+        views = staff_client.get(url).json()['views']
+        self.assertEqual(views['index']['requests'], 3)
+        self.assertEqual(sum(views['index']['buckets'].values()), 3)
+        self.assertIsNotNone(views['index']['p99_ms'])
+
+    def test_engine_keeps_django_alias(self):
+        """Бэкенд с замером рендера доступен под обычным именем django"""
+        self.assertIsInstance(engines['django'], TimedDjangoTemplates)
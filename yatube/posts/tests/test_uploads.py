@@ -0,0 +1,126 @@
+import gc
+import os
+import shutil
+import sys
+import struct
+import tempfile
+import zlib
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import (SimpleUploadedFile,
+                                            TemporaryUploadedFile)
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts.forms import PostForm
+from posts.models import Post
+
+User = get_user_model()
+
+
+def make_image(size, image_format='PNG', name='picture.png'):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'blue').save(buffer, image_format)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+def png_chunk(kind, data):
+    return (struct.pack('>I', len(data)) + kind + data
+            + struct.pack('>I', zlib.crc32(kind + data)))
+
+
+def png_bomb(width, height):
+    # Заявленный размер огромный, а пиксельных данных почти нет
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + png_chunk(b'IHDR', ihdr)
+            + png_chunk(b'IDAT', zlib.compress(b'\x00' * 1024))
+            + png_chunk(b'IEND', b''))
+
+
+@override_settings(IMAGE_MAX_PIXELS=1000 * 1000, IMAGE_MAX_SIDE=500,
+                   UPLOAD_MAX_SIZE=64 * 1024, THUMBNAIL_WORKERS=0)
+class BoundedUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        cls.media_settings = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media_settings.enable()
+        cls.user = User.objects.create_user(username='Author')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.media_settings.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client.force_login(BoundedUploadTests.user)
+
+    def form(self, image):
+        return PostForm({'text': 'text'}, files={'image': image})
+
+    def test_decompression_bomb_is_rejected(self):
+        """Картинка с огромными размерами отклоняется по заголовку"""
+        for size in [(3000, 3000), (50000, 50000)]:
+            with self.subTest(size=size):
+                bomb = SimpleUploadedFile('bomb.png', png_bomb(*size))
+                form = self.form(bomb)
+                self.assertFalse(form.is_valid())
+                self.assertEqual(form.errors.as_data()['image'][0].code,
+                                 'too_many_pixels')
+
+    def test_large_image_is_downscaled(self):
+        """Слишком большой оригинал уменьшается при приёме"""
+        form = self.form(make_image((900, 300)))
+        self.assertTrue(form.is_valid())
+        with Image.open(form.cleaned_data['image']) as image:
+            self.assertEqual(image.size, (500, 167))
+
+    def test_downscale_leaves_no_temporary_files(self):
+        """Уменьшение не оставляет временных файлов и ошибок в __del__"""
+        unraisable = []
+        hook, sys.unraisablehook = sys.unraisablehook, unraisable.append
+        self.addCleanup(setattr, sys, 'unraisablehook', hook)
+        # Результат в памяти и, если он больше лимита, во временном файле
+        for limit in (settings.FILE_UPLOAD_MAX_MEMORY_SIZE, 0):
+            with self.subTest(limit=limit), \
+                    self.settings(FILE_UPLOAD_MAX_MEMORY_SIZE=limit):
+                source = make_image((900, 300))
+                original = TemporaryUploadedFile('picture.png', 'image/png',
+                                                 source.size, None)
+                original.write(source.read())
+                original.seek(0)
+                path = original.temporary_file_path()
+                form = self.form(original)
+                self.assertTrue(form.is_valid())
+                self.assertFalse(os.path.exists(path))
+                post = form.save(commit=False)
+                post.author = BoundedUploadTests.user
+                post.save()
+                with Image.open(post.image) as image:
+                    self.assertEqual(image.size, (500, 167))
+                del form, post, original
+                gc.collect()
+        self.assertEqual(unraisable, [])
+
+    def test_oversize_upload_is_rejected(self):
+        """Файл больше лимита не сохраняется, память не растёт"""
+        noise = SimpleUploadedFile('noise.png', b'\x00' * 200 * 1024)
+        response = self.client.post(reverse('new_post'),
+                                    {'text': 'text', 'image': noise})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['form'].errors.as_data()[
+            'image'][0].code, 'too_large')
+        self.assertFalse(Post.objects.exists())
+
+    def test_upload_is_streamed_to_disk(self):
+        """Допустимая загрузка проходит через временный файл"""
+        response = self.client.post(reverse('new_post'), {
+            'text': 'text', 'image': make_image((100, 100)),
+        })
+        self.assertRedirects(response, reverse('index'))
+        self.assertTrue(Post.objects.get().image)
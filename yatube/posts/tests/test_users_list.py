@@ -0,0 +1,62 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.paginators import USERS_PER_PAGE
+
+User = get_user_model()
+
+
+class UsersListTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        User.objects.bulk_create(
+            User(username=f'user{i:03}', first_name=f'Имя{i}')
+            for i in range(USERS_PER_PAGE + 5)
+        )
+        User.objects.create_user(username='admin')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def usernames(self, response):
+        return [user.username for user in response.context['page']]
+
+    def test_pages_by_username(self):
+        """Справочник идёт по алфавиту курсорами и не читает лишних колонок"""
+        url = reverse('user_list')
+        with CaptureQueriesContext(connection) as context:
+            response = self.guest_client.get(url)
+        first = self.usernames(response)
+        self.assertEqual(first[0], 'admin')
+        self.assertEqual(len(first), USERS_PER_PAGE)
+        for query in context:
+            self.assertNotIn('password', query['sql'])
+        page = response.context['page']
+        response = self.guest_client.get(url, {'cursor': page.next_cursor})
+        second = self.usernames(response)
+        self.assertEqual(len(second), 6)
+        self.assertEqual(first + second, sorted(first + second))
+
+    def test_prefix_search(self):
+        """Поиск по началу имени пользователя"""
+        response = self.guest_client.get(reverse('user_list'),
+                                         {'q': 'user05'})
+        self.assertEqual(self.usernames(response),
+                         [f'user05{i}' for i in range(5)])
+
+    def test_page_is_cached_until_users_change(self):
+        """Страница справочника кэшируется до появления пользователя"""
+        url = reverse('user_list')
+        self.guest_client.get(url, {'q': 'new'})
+        User.objects.filter(username='admin').update(username='newbie')
+        response = self.guest_client.get(url, {'q': 'new'})
+        self.assertNotContains(response, 'newbie')
+        User.objects.create_user(username='newcomer')
+        response = self.guest_client.get(url, {'q': 'new'})
+        self.assertEqual(self.usernames(response), ['newbie', 'newcomer'])
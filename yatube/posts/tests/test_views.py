@@ -5,6 +5,7 @@ from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import Client, TestCase
 from django.urls import reverse
 from django import forms
@@ -87,6 +88,8 @@ class PostPageTests(TestCase):
         super().tearDownClass()
 
     def setUp(self):
+        # Гостевые страницы кэшируются целиком, а тестам нужен context
+        cache.clear()
         # Создаём неавторизованный клиент
         self.guest_client = Client()
         # Создаём авторизованный клиент
@@ -0,0 +1,144 @@
+"""
+Миниатюры картинок постов готовятся заранее, а не при рендере карточки:
+несколько ширин для srcset и современные форматы (WebP, AVIF).
+
+После сохранения поста в new_post/post_edit задача уходит в пул потоков
+и выполняется только после коммита транзакции. Шаблон лишь читает
+готовый Post.thumbnail, а пока миниатюры нет - показывает оригинал.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from yatube.timing import track
+
+try:
+    # AVIF в Pillow < 11 - только через плагин, без него отдаём WebP
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+from .background import after_commit
+from .models import Post
+
+THUMBNAIL_SIZE = (960, 339)
+THUMBNAIL_DIR = 'posts/thumbs'
+# Ширины для srcset: мобильные, карточка, экраны с высокой плотностью
+VARIANT_WIDTHS = (480, 960, 1440)
+FORMATS = {
+    'jpeg': ('JPEG', 'jpg', {'quality': 85, 'optimize': True}),
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'avif': ('AVIF', 'avif', {'quality': 60}),
+}
+# Браузер берёт первый подходящий <source>, поэтому сначала самые сжатые
+SOURCE_FORMATS = ('avif', 'webp')
+
+
+def available_formats():
+    Image.init()
+    return [name for name, (pil_format, _, _) in FORMATS.items()
+            if pil_format in Image.SAVE]
+
+
+def variant_size(width):
+    base_width, base_height = THUMBNAIL_SIZE
+    return width, round(base_height * width / base_width)
+
+
+def variant_widths(source_width):
+    # Крупнее оригинала не растягиваем, кроме базовой ширины карточки:
+    # её sorl раньше тоже увеличивал (upscale=True)
+    return sorted({width for width in VARIANT_WIDTHS
+                   if width <= source_width} | {THUMBNAIL_SIZE[0]})
+
+
+def variant_name(image_name, width, extension):
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    width, height = variant_size(width)
+    return f'{THUMBNAIL_DIR}/{stem}_{width}x{height}.{extension}'
+
+
+def derived_names(image_name):
+    """Все имена вариантов, какие могли быть сделаны из картинки."""
+    widths = {*VARIANT_WIDTHS, THUMBNAIL_SIZE[0]}
+    return {variant_name(image_name, width, extension)
+            for width in widths
+            for _, extension, _ in FORMATS.values()}
+
+
+def thumbnail_name(image_name):
+    return variant_name(image_name, THUMBNAIL_SIZE[0], 'jpg')
+
+
+def _encode(storage, name, image, pil_format, params):
+    if storage.exists(name):
+        storage.delete(name)
+    buffer = BytesIO()
+    image.save(buffer, pil_format, **params)
+    return storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def render_variants(image_name, storage=default_storage, force=False):
+    """
+    Кадрирует картинку по центру под пропорции карточки в нескольких
+    ширинах и кодирует в JPEG, WebP и, если Pillow умеет, AVIF.
+    Возвращает {формат: {ширина: имя файла}}. Не трогает БД, поэтому
+    годится и для отдельных процессов.
+    """
+    with storage.open(image_name) as source:
+        original = Image.open(source)
+        # Ширину знаем из заголовка, пиксели ещё не декодированы
+        names = {
+            (width, name): variant_name(image_name, width, FORMATS[name][1])
+            for width in variant_widths(original.width)
+            for name in available_formats()
+        }
+        # Имена выводятся из имени картинки, а одинаковые картинки
+        # хранятся одним файлом: готовые варианты подходят и так
+        if force or not all(map(storage.exists, names.values())):
+            original = original.convert('RGB')
+        else:
+            original = None
+    variants = {}
+    resized = {}
+    for (width, name), file_name in names.items():
+        if original is not None:
+            if width not in resized:
+                resized[width] = ImageOps.fit(
+                    original, variant_size(width), Image.LANCZOS)
+            pil_format, _, params = FORMATS[name]
+            file_name = _encode(storage, file_name, resized[width],
+                                pil_format, params)
+        variants.setdefault(name, {})[width] = file_name
+    return variants
+
+
+def attach_variants(post_id, image_name, variants):
+    # Пока варианты готовились, картинку могли заменить
+    post = Post.objects.filter(pk=post_id, image=image_name).first()
+    if post is None:
+        return False
+    post.thumbnail = variants['jpeg'][THUMBNAIL_SIZE[0]]
+    post.image_variants = variants
+    # Через save(), чтобы сигналы сбросили кэш карточки и страниц
+    post.save(update_fields=['thumbnail', 'variants', 'updated'])
+    return True
+
+
+def generate_thumbnail(post_id, image_name):
+    # В запросе (THUMBNAIL_WORKERS = 0) время попадёт в Server-Timing
+    with track('thumbnail'):
+        variants = render_variants(image_name)
+    return attach_variants(post_id, image_name, variants)
+
+
+def schedule_thumbnail(post):
+    """Ставит миниатюру в очередь после коммита текущей транзакции."""
+    if not post.image:
+        return
+    after_commit('thumbnails', settings.THUMBNAIL_WORKERS,
+                 generate_thumbnail, post.pk, post.image.name)
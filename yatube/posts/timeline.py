@@ -0,0 +1,139 @@
+"""
+Лента подписок (follow_index).
+
+Новый пост раскладывается по материализованным лентам подписчиков
+(TimelineEntry) после коммита в фоновом потоке, пачками. Лента читается одним
+диапазоном по индексу (user, -pub_date, post). Авторы, у которых
+подписчиков больше FANOUT_FOLLOWER_LIMIT, не раскладываются: их посты
+подмешиваются при чтении из Post по индексу (author, -pub_date). Когда
+подписчиков снова меньше лимита, следующая публикация возвращает
+автора к раскладке.
+"""
+from django.conf import settings
+
+from .background import after_commit
+from .models import Follow, Post, TimelineEntry, UserCounters
+from .paginators import CursorPaginator, sort_by_ordering
+
+TIMELINE_ORDERING = ('-pub_date', 'post_id')
+FANOUT_BATCH_SIZE = 1000
+# Сколько последних постов автора попадает в ленту при подписке
+BACKFILL_SIZE = 50
+
+
+def _entries(user_id, posts):
+    return [TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for post in posts]
+
+
+def is_pull_author(author_id):
+    followers = UserCounters.objects.filter(user_id=author_id).values_list(
+        'followers', flat=True).first()
+    return (followers or 0) > settings.FANOUT_FOLLOWER_LIMIT
+
+
+def _followers(author_id, pull):
+    """user_id подписчиков автора пачками по возрастанию."""
+    followers = Follow.objects.filter(
+        author_id=author_id, pull=pull
+    ).order_by('user_id').values_list('user_id', flat=True)
+    last_user_id = 0
+    while True:
+        batch = list(followers.filter(
+            user_id__gt=last_user_id)[:FANOUT_BATCH_SIZE])
+        if not batch:
+            return
+        yield batch
+        last_user_id = batch[-1]
+
+
+def _push_again(author_id):
+    """
+    Автор снова под лимитом: его pull-подписчикам раскладываем свежие
+    посты, а дальше новые посты приходят им при публикации.
+    """
+    posts = list(Post.objects.filter(author_id=author_id).only(
+        'id', 'pub_date')[:BACKFILL_SIZE])
+    for batch in _followers(author_id, pull=True):
+        TimelineEntry.objects.bulk_create(
+            [entry for user_id in batch
+             for entry in _entries(user_id, posts)],
+            ignore_conflicts=True,
+        )
+        Follow.objects.filter(author_id=author_id,
+                              user_id__in=batch).update(pull=False)
+
+
+def publish(post_id, author_id, pub_date):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_pull_author(author_id):
+        # Автор перерос раскладку: дальше его читают при открытии ленты
+        Follow.objects.filter(author_id=author_id,
+                              pull=False).update(pull=True)
+        return
+    if Follow.objects.filter(author_id=author_id, pull=True).exists():
+        _push_again(author_id)
+    for batch in _followers(author_id, pull=False):
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(user_id=user_id, post_id=post_id,
+                           pub_date=pub_date) for user_id in batch],
+            ignore_conflicts=True,
+        )
+
+
+def schedule_publish(post):
+    """
+    Раскладка после коммита в фоновом потоке: у автора могут быть
+    тысячи подписчиков, а new_post не должен держать запись в БД.
+    """
+    after_commit('timeline', settings.FANOUT_WORKERS, publish, post.pk,
+                 post.author_id, post.pub_date)
+
+
+def followed(follow):
+    """Подписка: свежие посты автора сразу появляются в ленте."""
+    if is_pull_author(follow.author_id):
+        Follow.objects.filter(pk=follow.pk).update(pull=True)
+        return
+    posts = Post.objects.filter(author_id=follow.author_id).only(
+        'id', 'pub_date')[:BACKFILL_SIZE]
+    TimelineEntry.objects.bulk_create(_entries(follow.user_id, posts),
+                                      ignore_conflicts=True)
+
+
+def unfollowed(follow):
+    TimelineEntry.objects.filter(
+        user_id=follow.user_id, post__author_id=follow.author_id
+    ).delete()
+
+
+class TimelinePaginator(CursorPaginator):
+    """
+    Keyset-паджинатор по ленте подписок. Элементы страницы -
+    TimelineEntry, пост - в entry.post.
+    """
+
+    def __init__(self, user, per_page):
+        entries = TimelineEntry.objects.filter(user=user).select_related(
+            'post__author', 'post__group')
+        super().__init__(entries, per_page, ordering=TIMELINE_ORDERING)
+        self.user = user
+
+    def fetch(self, ordering, values=None):
+        items = super().fetch(ordering, values)
+        pull_authors = list(Follow.objects.filter(
+            user=self.user, pull=True).values_list('author_id', flat=True))
+        if not pull_authors:
+            return items
+        # Ключи те же, только у поста id вместо post_id
+        post_ordering = [name.replace('post_id', 'id') for name in ordering]
+        posts = CursorPaginator(
+            Post.objects.for_feed().filter(author_id__in=pull_authors),
+            self.per_page, post_ordering,
+        ).fetch(post_ordering, values)
+        merged = {item.post_id: item for item in items}
+        # Записи, разложенные до перехода автора в pull, не дублируем
+        for entry in _entries(self.user.pk, posts):
+            merged.setdefault(entry.post_id, entry)
+        items = sort_by_ordering(merged.values(), ordering)
+        return items[:self.per_page + 1]
@@ -0,0 +1,130 @@
+"""
+Приём картинок с ограниченной памятью на запрос.
+
+BoundedUploadHandler пишет загрузку на диск кусками и перестаёт писать,
+как только файл превысил UPLOAD_MAX_SIZE. BoundedImageField смотрит
+размеры картинки по заголовку до любого декодирования, отбрасывает
+«бомбы» и уменьшает слишком большие оригиналы.
+"""
+import tempfile
+import warnings
+from io import BytesIO
+
+from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+# Уменьшаем только форматы, которые пересохраняются без потерь смысла;
+# у GIF пропала бы анимация
+DOWNSCALE_FORMATS = {
+    'JPEG': {'quality': 90},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 90},
+}
+
+
+def _source(data):
+    if hasattr(data, 'temporary_file_path'):
+        return data.temporary_file_path()
+    return data
+
+
+class BoundedUploadHandler(TemporaryFileUploadHandler):
+    """Всегда пишет на диск и не хранит больше UPLOAD_MAX_SIZE байт."""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.file.oversize = False
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.UPLOAD_MAX_SIZE:
+            # Остаток тела запроса дочитывается и выбрасывается,
+            # ошибку покажет поле формы
+            self.file.oversize = True
+            return None
+        return super().receive_data_chunk(raw_data, start)
+
+
+class BoundedImageField(forms.ImageField):
+    default_error_messages = {
+        'too_large': 'Файл больше %(limit)s.',
+        'too_many_pixels': (
+            'Картинка %(width)s×%(height)s слишком большая, '
+            'допустимо до %(limit)s мегапикселей.'
+        ),
+    }
+
+    def to_python(self, data):
+        if data in self.empty_values:
+            return super().to_python(data)
+        if getattr(data, 'oversize', False):
+            raise ValidationError(
+                self.error_messages['too_large'], code='too_large',
+                params={'limit': filesizeformat(settings.UPLOAD_MAX_SIZE)},
+            )
+        if hasattr(data, 'read'):
+            self.check_dimensions(data)
+        f = super().to_python(data)
+        if f is None:
+            return None
+        return self.downscale(f)
+
+    def check_dimensions(self, data):
+        """Размеры берутся из заголовка, пиксели не декодируются."""
+        limit = settings.IMAGE_MAX_PIXELS
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+                with Image.open(_source(data)) as image:
+                    width, height = image.size
+        except Image.DecompressionBombError:
+            width = height = None
+        except Exception:
+            # Не картинка: сообщение даст родительский to_python
+            return
+        finally:
+            if hasattr(data, 'seek'):
+                data.seek(0)
+        if width is None or width * height > limit:
+            raise ValidationError(
+                self.error_messages['too_many_pixels'],
+                code='too_many_pixels',
+                params={'width': width or '?', 'height': height or '?',
+                        'limit': limit // 1000000},
+            )
+
+    def downscale(self, f):
+        side = settings.IMAGE_MAX_SIDE
+        image_format = f.image.format
+        if (max(f.image.size) <= side
+                or image_format not in DOWNSCALE_FORMATS):
+            return f
+        with Image.open(_source(f)) as image:
+            # JPEG декодируется сразу в уменьшенном масштабе
+            image.draft('RGB', (side, side))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((side, side), Image.LANCZOS)
+            content = BytesIO()
+            image.save(content, image_format,
+                       **DOWNSCALE_FORMATS[image_format])
+        size = content.tell()
+        if size > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+            # Большой результат - во временный файл без имени: его
+            # освобождает ОС при закрытии, удалять по имени нечего
+            spooled = tempfile.TemporaryFile(
+                dir=settings.FILE_UPLOAD_TEMP_DIR)
+            spooled.write(content.getbuffer())
+            content = spooled
+        content.seek(0)
+        resized = UploadedFile(content, f.name, f.content_type, size,
+                               f.charset, f.content_type_extra)
+        resized.image = image
+        # Временный файл оригинала больше не нужен
+        f.close()
+        return resized
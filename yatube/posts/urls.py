@@ -8,11 +8,19 @@ urlpatterns = [
     path("new/", views.new_post, name="new_post"),
     path("group/", views.group_list, name="group_list"),
     path("user/", views.users_list, name="user_list"),
+    path("search/", views.search, name="search"),
+    path("follow/", views.follow_index, name="follow_index"),
     path("group/<slug:slug>/", views.group_posts, name="group_posts"),
     path('<str:username>/', views.profile, name='profile'),
     path('<str:username>/<int:post_id>/', views.post_view, name='post'),
+    path('<str:username>/follow/', views.profile_follow,
+         name='profile_follow'),
+    path('<str:username>/unfollow/', views.profile_unfollow,
+         name='profile_unfollow'),
     path('<str:username>/<int:post_id>/edit/', views.post_edit,
          name='post_edit'),
+    path('<str:username>/<int:post_id>/comments/', views.post_comments,
+         name='post_comments'),
     path("<username>/<int:post_id>/comment", views.add_comment, name="add_comment"), 
 
 ]
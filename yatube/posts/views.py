@@ -1,27 +1,40 @@
 from .forms import CommentForm, PostForm
 from django.shortcuts import render, get_object_or_404, redirect
-from django.core.paginator import Paginator
-from .models import Group, Post, User
+from . import counters
+from .cache import (INDEX_PAGES, USERS_PAGES, cache_anonymous_page,
+                    group_pages)
+from .freshness import (post_etag, post_last_modified, post_state,
+                        profile_etag, profile_last_modified, profile_state)
+from .models import Comment, Follow, Group, Post, User
+from .paginators import (COMMENT_ORDERING, COMMENTS_PER_PAGE,
+                         POSTS_PER_PAGE, USERS_PER_PAGE, CursorPaginator,
+                         get_feed_page)
+from .search import search_posts
+from .timeline import TimelinePaginator
+from .thumbnails import schedule_thumbnail
 from django.contrib.auth.decorators import login_required
+from django.http import Http404, JsonResponse
+from django.utils.http import urlencode
+from django.views.decorators.http import condition, require_POST
 
 
+@cache_anonymous_page(INDEX_PAGES)
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = Post.objects.for_feed()
+    page = get_feed_page(request, post_list,
+                         counter_key=counters.ALL_POSTS_KEY)
     return render(request,
                   'posts/index.html',
                   {'page': page, }
                   )
 
 
+@cache_anonymous_page(group_pages)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = group.posts.for_feed()
+    page = get_feed_page(request, post_list,
+                         counter_key=counters.group_posts_key(group.pk))
     return render(request, "posts/group.html", {"group": group, "page": page})
 
 
@@ -31,25 +44,35 @@ def group_list(request):
     return render(request, "posts/groups_list.html", {"groups": groups})
 
 
+@condition(etag_func=profile_etag, last_modified_func=profile_last_modified)
 def profile(request, username):
-    user = get_object_or_404(User, username=username)
-    post_list = user.posts.all()
-    paginator = Paginator(post_list, 10)
-    post_count = paginator.count
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    # Счётчики карточки автора приходят вместе с пользователем
+    user = get_object_or_404(User.objects.select_related("counters"),
+                             username=username)
+    stats = counters.user_counters(user)
+    post_list = user.posts.for_feed()
+    page = get_feed_page(request, post_list, count=stats.posts)
+    # Подписка зрителя уже проверена при проверке свежести страницы
+    state = profile_state(request, username)
     content = {
         "user_post": user,
         "page": page,
-        "post_count": post_count
+        "post_count": stats.posts,
+        "follower_count": stats.followers,
+        "following_count": stats.following,
+        "following": state["is_following"],
     }
     return render(request, 'posts/profile.html', content)
 
 
+@condition(etag_func=post_etag, last_modified_func=post_last_modified)
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, pk=post_id, author__username=username)
+    post = get_object_or_404(
+        Post.objects.for_feed().select_related("author__counters"),
+        pk=post_id, author__username=username
+    )
     user = post.author
-    post_count = user.posts.count()
+    stats = counters.user_counters(user)
 
     form = CommentForm(request.POST or None)
     if form.is_valid():
@@ -58,22 +81,133 @@ def post_view(request, username, post_id):
         comment.post = post
         comment.save()
         return redirect("post", username=username, post_id=post_id)
-    
-    comments = post.comments.all()
+
+    comments = comment_page(post_id, request.GET.get("cursor"))
+    state = post_state(request, username, post_id)
     content = {
         "user_post": user,
         "post": post,
-        "post_count": post_count,
+        "post_count": stats.posts,
+        "follower_count": stats.followers,
+        "following_count": stats.following,
+        "following": state["is_following"],
         "form": form,
         "comments": comments,
-        # "comments_page": comments_page
+        "username": username,
+        "post_id": post_id,
     }
     return render(request, 'posts/post.html', content)
 
 
+def comment_page(post_id, cursor=None):
+    # Автор комментария приходит JOIN-ом, от него нужен только username
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        "author").only("text", "created", "post_id", "author__username")
+    paginator = CursorPaginator(comments, COMMENTS_PER_PAGE,
+                                ordering=COMMENT_ORDERING)
+    return paginator.page(cursor)
+
+
+@condition(etag_func=post_etag, last_modified_func=post_last_modified)
+def post_comments(request, username, post_id):
+    """
+    Следующая пачка комментариев для подгрузки при прокрутке:
+    HTML-фрагмент или JSON (?format=json).
+    """
+    if post_state(request, username, post_id) is None:
+        raise Http404
+    comments = comment_page(post_id, request.GET.get("cursor"))
+    if request.GET.get("format") == "json":
+        return JsonResponse({
+            "comments": [
+                {
+                    "id": comment.pk,
+                    "author": comment.author.username,
+                    "text": comment.text,
+                    "created": comment.created.isoformat(),
+                }
+                for comment in comments
+            ],
+            "next_cursor": comments.next_cursor,
+        })
+    return render(request, "posts/includes/comment_list.html", {
+        "comments": comments,
+        "username": username,
+        "post_id": post_id,
+    })
+
+
+@login_required
+def follow_index(request):
+    paginator = TimelinePaginator(request.user, POSTS_PER_PAGE)
+    page = paginator.page(request.GET.get("cursor"))
+    return render(request, "posts/follow.html", {"page": page})
+
+
+@login_required
+@require_POST
+def profile_follow(request, username):
+    author = get_object_or_404(User, username=username)
+    if author != request.user:
+        Follow.objects.get_or_create(user=request.user, author=author)
+    return redirect("profile", username=username)
+
+
+@login_required
+@require_POST
+def profile_unfollow(request, username):
+    author = get_object_or_404(User, username=username)
+    # delete() по одному объекту, чтобы сработал сигнал чистки ленты
+    for follow in Follow.objects.filter(user=request.user, author=author):
+        follow.delete()
+    return redirect("profile", username=username)
+
+
+def search(request):
+    query = request.GET.get("q", "").strip()
+    group_slug = request.GET.get("group", "")
+    author = request.GET.get("author", "").strip()
+    post_list = Post.objects.for_feed()
+    if group_slug:
+        post_list = post_list.filter(group__slug=group_slug)
+    if author:
+        post_list = post_list.filter(author__username=author)
+    # Сначала самые релевантные, id - для однозначного порядка курсора
+    paginator = CursorPaginator(search_posts(query, post_list),
+                                POSTS_PER_PAGE, ordering=("rank", "id"))
+    page = paginator.page(request.GET.get("cursor"))
+    params = request.GET.copy()
+    params.pop("cursor", None)
+    content = {
+        "page": page,
+        "query": query,
+        "group_slug": group_slug,
+        "author": author,
+        "groups": Group.objects.all(),
+        "query_prefix": f"{params.urlencode()}&" if params else "",
+    }
+    return render(request, "posts/search.html", content)
+
+
+@cache_anonymous_page(USERS_PAGES)
 def users_list(request):
-    users = User.objects.all()
-    return render(request, "posts/users_list.html", {"users": users})
+    query = request.GET.get("q", "").strip()
+    # Карточке нужны только имена: ни паролей, ни остальных колонок
+    users = User.objects.only("username", "first_name", "last_name")
+    if query:
+        # Префикс как диапазон по уникальному индексу username,
+        # LIKE 'abc%' индекс не использует
+        users = users.filter(username__gte=query,
+                             username__lt=query + "\U0010ffff")
+    paginator = CursorPaginator(users, USERS_PER_PAGE,
+                                ordering=("username",))
+    page = paginator.page(request.GET.get("cursor"))
+    content = {
+        "page": page,
+        "query": query,
+        "query_prefix": urlencode({"q": query}) + "&" if query else "",
+    }
+    return render(request, "posts/users_list.html", content)
 
 
 @login_required
@@ -83,6 +217,7 @@ def new_post(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        schedule_thumbnail(post)
         return redirect("/")
     return render(request, "posts/new_post.html", {"form": form})
 
@@ -90,11 +225,23 @@ def new_post(request):
 @login_required
 def post_edit(request, username, post_id):
     post = get_object_or_404(Post, author__username=username, pk=post_id)
-    if request.user != post.author:
+    if request.user.pk != post.author_id:
         return redirect("/")
     form = PostForm(request.POST or None, files=request.FILES or None, instance=post)
     if form.is_valid():
-        form.save()
+        post = form.save(commit=False)
+        image_changed = "image" in form.changed_data
+        if image_changed:
+            # Старые миниатюры относятся к прежней картинке. Обычное
+            # сохранение их не пишет, поэтому перечисляем явно
+            post.thumbnail = None
+            post.image_variants = None
+            post.save(update_fields=[*Post.full_save_fields(),
+                                     "thumbnail", "variants"])
+        else:
+            post.save()
+        if image_changed:
+            schedule_thumbnail(post)
         return redirect("post", username=username, post_id=post_id)
     return render(request, "posts/post_edit.html", {"form": form})
 
@@ -0,0 +1,180 @@
+"""
+ASGI config for yatube project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+Django 2.2 has no native ASGI handler or async views, so the WSGI
+application is wrapped: the event loop of the ASGI server (uvicorn,
+daphne, hypercorn) reads request bodies and writes responses to the
+socket, and only the Django view itself runs in a bounded thread pool.
+A slow client therefore occupies a coroutine instead of a worker thread.
+Chunks of a streaming response (StreamingHttpResponse, FileResponse)
+are sent as the view produces them; the worker thread waits only when
+STREAM_BUFFER chunks are not yet sent.
+
+    uvicorn yatube.asgi:application --workers 4
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+BODY_MEMORY_LIMIT = 1024 * 1024
+# Чанков ответа между потоком view и отправкой клиенту
+STREAM_BUFFER = 8
+
+
+class WsgiToAsgi:
+    def __init__(self, wsgi_application, max_workers=None):
+        self.wsgi_application = wsgi_application
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='yatube-wsgi'
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(f"Unsupported scope type {scope['type']!r}")
+        body = await self.read_body(receive)
+        if body is None:
+            return
+        environ = self.build_environ(scope, body)
+        loop = asyncio.get_running_loop()
+        messages = asyncio.Queue(maxsize=STREAM_BUFFER)
+        stopped = threading.Event()
+        # Ошибки run_wsgi приходят через очередь
+        loop.run_in_executor(
+            self.executor, self.run_wsgi, environ, loop, messages, stopped
+        )
+        try:
+            message = await messages.get()
+            while message is not None:
+                if isinstance(message, Exception):
+                    raise message
+                await send(message)
+                message = await messages.get()
+        finally:
+            # Клиент ушёл или send упал: поток view перестаёт читать
+            # ответ, а освобождённая очередь не даёт ему зависнуть в put
+            stopped.set()
+            while not messages.empty():
+                messages.get_nowait()
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive):
+        body = tempfile.SpooledTemporaryFile(max_size=BODY_MEMORY_LIMIT)
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body', False):
+                break
+        body.seek(0)
+        return body
+
+    def build_environ(self, scope, body):
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        # WSGI ждёт путь как байты, раскодированные в latin-1
+        path = scope['path'].encode('utf-8').decode('latin-1')
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', ''),
+            'PATH_INFO': path,
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for raw_name, raw_value in scope.get('headers', []):
+            name = raw_name.decode('latin-1').upper().replace('-', '_')
+            value = raw_value.decode('latin-1')
+            if name == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+                continue
+            if name == 'CONTENT_LENGTH':
+                environ['CONTENT_LENGTH'] = value
+                continue
+            key = f'HTTP_{name}'
+            if key in environ:
+                value = f'{environ[key]},{value}'
+            environ[key] = value
+        return environ
+
+    def run_wsgi(self, environ, loop, messages, stopped):
+        def put(message):
+            if stopped.is_set():
+                return False
+            asyncio.run_coroutine_threadsafe(
+                messages.put(message), loop
+            ).result()
+            return True
+
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and response:
+                raise exc_info[1].with_traceback(exc_info[2])
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in headers
+            ]
+
+        try:
+            result = self.wsgi_application(environ, start_response)
+            try:
+                put({
+                    'type': 'http.response.start',
+                    'status': response['status'],
+                    'headers': response['headers'],
+                })
+                for chunk in result:
+                    if chunk and not put({
+                        'type': 'http.response.body',
+                        'body': chunk,
+                        'more_body': True,
+                    }):
+                        break
+                else:
+                    put({'type': 'http.response.body', 'body': b''})
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+        except Exception as error:
+            put(error)
+        finally:
+            environ['wsgi.input'].close()
+            put(None)
+
+
+application = WsgiToAsgi(get_wsgi_application())
@@ -0,0 +1,246 @@
+"""
+Кэш-бэкенды проекта.
+
+LRUCache - ограниченный по объёму кэш в памяти процесса со статистикой
+попаданий. TieredCache - двухуровневый кэш: быстрый локальный уровень
+перед общим для всех воркеров (файловым или в БД).
+"""
+import pickle
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Хранилища общие для всех потоков процесса, как у LocMemCache:
+# django.core.cache.caches создаёт экземпляр бэкенда на каждый поток
+_stores = {}
+_stores_lock = Lock()
+
+_MISSING = object()
+
+
+class _Store:
+    def __init__(self):
+        self.data = OrderedDict()
+        self.lock = Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+class LRUCache(BaseCache):
+    """
+    OPTIONS:
+        MAX_SIZE - предел суммарного размера значений в байтах,
+                   при превышении вытесняются давно не читанные записи.
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, name, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._max_size = int(options.get('MAX_SIZE', 64 * 1024 * 1024))
+        with _stores_lock:
+            self._store = _stores.setdefault(name, _Store())
+
+    def _expired(self, key):
+        # Вызывается под блокировкой
+        entry = self._store.data.get(key)
+        return entry is None or (
+            entry[0] is not None and entry[0] <= time.time()
+        )
+
+    def _delete(self, key):
+        entry = self._store.data.pop(key, None)
+        if entry is None:
+            return False
+        self._store.size -= len(entry[1])
+        return True
+
+    def _set(self, key, pickled, timeout):
+        self._delete(key)
+        if len(pickled) > self._max_size:
+            return
+        store = self._store
+        while store.data and store.size + len(pickled) > self._max_size:
+            _, (_, evicted) = store.data.popitem(last=False)
+            store.size -= len(evicted)
+            store.evictions += 1
+        store.data[key] = (self.get_backend_timeout(timeout), pickled)
+        store.size += len(pickled)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        with self._store.lock:
+            if not self._expired(key):
+                return False
+            self._set(key, pickled, timeout)
+            return True
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        store = self._store
+        with store.lock:
+            if self._expired(key):
+                self._delete(key)
+                store.misses += 1
+                return default
+            store.hits += 1
+            store.data.move_to_end(key)
+            pickled = store.data[key][1]
+        return pickle.loads(pickled)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        with self._store.lock:
+            self._set(key, pickled, timeout)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        with self._store.lock:
+            if self._expired(key):
+                return False
+            pickled = self._store.data[key][1]
+            self._store.data[key] = (self.get_backend_timeout(timeout),
+                                     pickled)
+            return True
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._store.lock:
+            if self._expired(key):
+                self._delete(key)
+                raise ValueError(f"Key '{key}' not found")
+            expiry, pickled = self._store.data[key]
+            value = pickle.loads(pickled) + delta
+            self._delete(key)
+            pickled = pickle.dumps(value, self.pickle_protocol)
+            self._store.data[key] = (expiry, pickled)
+            self._store.size += len(pickled)
+        return value
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._store.lock:
+            if self._expired(key):
+                self._delete(key)
+                return False
+            return True
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._store.lock:
+            return self._delete(key)
+
+    def clear(self):
+        with self._store.lock:
+            self._store.data.clear()
+            self._store.size = 0
+
+    def get_stats(self):
+        store = self._store
+        with store.lock:
+            requests = store.hits + store.misses
+            return {
+                'items': len(store.data),
+                'size': store.size,
+                'max_size': self._max_size,
+                'hits': store.hits,
+                'misses': store.misses,
+                'hit_rate': store.hits / requests if requests else None,
+                'evictions': store.evictions,
+            }
+
+
+class TieredCache(BaseCache):
+    """
+    OPTIONS:
+        LOCAL - алиас быстрого кэша процесса (LRUCache),
+        SHARED - алиас общего кэша (FileBasedCache, DatabaseCache),
+        LOCAL_TIMEOUT - сколько секунд держать копию в локальном уровне.
+
+    Запись идёт в оба уровня, чтение - сначала из локального. Удаление
+    в одном воркере не видно локальным уровням других, поэтому
+    LOCAL_TIMEOUT ограничивает, насколько устаревшими могут быть данные.
+    """
+
+    def __init__(self, name, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._local_alias = options.get('LOCAL', 'local')
+        self._shared_alias = options.get('SHARED', 'shared')
+        self._local_timeout = int(options.get('LOCAL_TIMEOUT', 5))
+
+    @property
+    def local(self):
+        return caches[self._local_alias]
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _local_ttl(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return self._local_timeout
+        return min(timeout, self._local_timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self.local.set(key, value, self._local_ttl(timeout),
+                           version=version)
+        return added
+
+    def get(self, key, default=None, version=None):
+        value = self.local.get(key, _MISSING, version=version)
+        if value is not _MISSING:
+            return value
+        value = self.shared.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            return default
+        self.local.set(key, value, self._local_ttl(DEFAULT_TIMEOUT),
+                       version=version)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        self.local.set(key, value, self._local_ttl(timeout),
+                       version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self.local.touch(key, self._local_ttl(timeout), version=version)
+        return self.shared.touch(key, timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version=version)
+        self.local.delete(key, version=version)
+        return value
+
+    def has_key(self, key, version=None):
+        return (self.local.has_key(key, version=version)
+                or self.shared.has_key(key, version=version))
+
+    def delete(self, key, version=None):
+        self.local.delete(key, version=version)
+        return self.shared.delete(key, version=version)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def get_stats(self):
+        return {'local': self.local.get_stats()}
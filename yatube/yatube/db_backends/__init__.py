@@ -0,0 +1,7 @@
+"""
+Бэкенды базы данных проекта.
+
+sqlite3 - SQLite в режиме WAL: читатели не ждут пишущего.
+postgresql - PostgreSQL с пулом соединений в процессе и проверкой
+живости соединения перед первым запросом.
+"""
@@ -0,0 +1,130 @@
+"""
+OPTIONS['pool'] = {'min_size', 'max_size', 'timeout'} - брать соединения
+из пула процесса (psycopg2.pool) и возвращать туда вместо закрытия.
+Без него соединения обычные, например к pgbouncer.
+
+CONN_HEALTH_CHECKS = True - постоянное соединение (CONN_MAX_AGE) и
+соединение из пула проверяются SELECT 1 перед первым запросом, как
+в Django 4.1: упавший сервер или рестарт pgbouncer не дают 500.
+"""
+import os
+from threading import BoundedSemaphore, Lock
+
+from django.db.backends.postgresql import base
+from psycopg2 import pool as pg_pool
+
+Database = base.Database
+
+_pools = {}
+_pools_lock = Lock()
+
+
+class _Pool:
+    """ThreadedConnectionPool, который ждёт свободное соединение."""
+
+    def __init__(self, conn_params, min_size=1, max_size=10, timeout=10):
+        self.connections = pg_pool.ThreadedConnectionPool(
+            min_size, max_size, **conn_params)
+        self.slots = BoundedSemaphore(max_size)
+        self.timeout = timeout
+
+    def get(self):
+        if not self.slots.acquire(timeout=self.timeout):
+            raise Database.OperationalError(
+                f'No free connection in the pool after {self.timeout} s')
+        try:
+            return self.connections.getconn()
+        except Exception:
+            self.slots.release()
+            raise
+
+    def put(self, connection, close=False):
+        try:
+            self.connections.putconn(connection, close=close)
+        finally:
+            self.slots.release()
+
+
+def _get_pool(alias, conn_params, options):
+    # Тестовая база - другое NAME, значит и другой пул. Процесс после
+    # fork (воркеры gunicorn с --preload) не должен брать соединения
+    # из пула родителя: сокеты общие, протоколы перемешаются
+    key = (os.getpid(), alias, tuple(sorted(conn_params.items())))
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = _Pool(conn_params, **options)
+        return _pools[key]
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    pool = None
+    health_check_done = False
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        self.pool_options = conn_params.pop('pool', None)
+        return conn_params
+
+    @property
+    def health_checks(self):
+        return self.settings_dict.get('CONN_HEALTH_CHECKS', False)
+
+    def get_new_connection(self, conn_params):
+        if not self.pool_options:
+            return super().get_new_connection(conn_params)
+        self.pool = _get_pool(self.alias, conn_params, self.pool_options)
+        connection = self.pool.get()
+        # Соединение могло умереть, пока лежало в пуле
+        while connection.closed or (self.health_checks
+                                    and not self._alive(connection)):
+            self.pool.put(connection, close=True)
+            connection = self.pool.get()
+        # Как в родителе, но без connect(): уровень изоляции из OPTIONS
+        isolation_level = self.settings_dict['OPTIONS'].get('isolation_level')
+        if isolation_level is None:
+            self.isolation_level = connection.isolation_level
+        else:
+            self.isolation_level = isolation_level
+            if isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=isolation_level)
+        return connection
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+
+    def _alive(self, connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except Database.Error:
+            return False
+        return True
+
+    def ensure_connection(self):
+        # Проверка раз за запрос, внутри транзакции переподключаться нельзя
+        if (self.connection is not None and self.health_checks
+                and not self.health_check_done and not self.in_atomic_block):
+            self.health_check_done = True
+            if not self.is_usable():
+                self.close()
+        super().ensure_connection()
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def _close(self):
+        if self.connection is None or self.pool is None:
+            return super()._close()
+        connection = self.connection
+        close = bool(connection.closed)
+        if not close:
+            try:
+                # Откат и RESET ALL: следующий
+                # владелец получит соединение как новое
+                connection.reset()
+            except Database.Error:
+                close = True
+        with self.wrap_database_errors:
+            self.pool.put(connection, close=close)
@@ -0,0 +1,29 @@
+from django.db.backends.sqlite3 import base
+
+# OPTIONS['pragmas'] дополняют и переопределяют эти значения
+PRAGMAS = {
+    # Запись идёт в журнал, читатели видят последний коммит и не ждут
+    'journal_mode': 'WAL',
+    # В WAL fsync на каждый коммит не нужен: при сбое питания теряется
+    # лишь последняя транзакция, целостность базы сохраняется
+    'synchronous': 'NORMAL',
+    # Сколько ждать чужую запись, прежде чем ответить "database is locked"
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+    # 64 МБ страничного кэша и 256 МБ mmap на соединение
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.pragmas = {**PRAGMAS, **kwargs.pop('pragmas', {})}
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
@@ -0,0 +1,167 @@
+"""
+Журнал медленных запросов и поиск N+1.
+
+QueryInspector собирает SELECT-запросы, сгруппированные по форме:
+литералы и параметры заменены на ?, списки IN свёрнуты. Одна и та же
+форма, выполненная много раз за запрос, - почти всегда N+1: для неё
+запоминается строка шаблона и строка кода проекта, откуда пришёл
+повтор. Запросы дольше SLOW_QUERY_MS пишутся в лог всегда, разбор
+по формам - для доли запросов QUERY_INSPECTOR_SAMPLE_RATE.
+
+В тестах - inspect_queries() и assert_no_repeats(), для pytest есть
+фикстура no_n_plus_one (tests/fixtures/fixture_queries.py).
+"""
+import logging
+import os
+import random
+import re
+import sys
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.template.base import Node
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w".])-?\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_IN_LIST = re.compile(r'\bIN \((?:\?, )*\?\)', re.IGNORECASE)
+_SPACES = re.compile(r'\s+')
+# N+1 - это повторы чтений. BEGIN, SAVEPOINT/RELEASE и UPDATE счётчиков
+# на каждое сохранение повторяются законно
+_READ = re.compile(r'\s*(?:SELECT|WITH)\b', re.IGNORECASE)
+
+# Обёртки execute_wrapper сами по себе не источник запроса
+_INSTRUMENTATION = {__name__, 'yatube.timing'}
+
+
+def normalize(sql):
+    """Форма запроса: без литералов и параметров, IN (...) свёрнут."""
+    sql = _SPACES.sub(' ', sql.strip())
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+def _project_frame(frame):
+    filename = frame.f_code.co_filename
+    return (filename.startswith(str(settings.BASE_DIR))
+            and 'site-packages' not in filename
+            and frame.f_globals.get('__name__') not in _INSTRUMENTATION)
+
+
+def origin():
+    """
+    Откуда пришёл запрос: ближайшая строка шаблона (узел, который
+    рендерился) и ближайшая строка кода проекта.
+    """
+    template = code = None
+    frame = sys._getframe(1)
+    while frame is not None and (template is None or code is None):
+        node = frame.f_locals.get('self')
+        if (template is None and isinstance(node, Node)
+                and getattr(node, 'token', None) is not None):
+            name = node.origin.template_name or node.origin.name
+            template = f'{name}:{node.token.lineno}'
+        elif code is None and _project_frame(frame):
+            path = os.path.relpath(frame.f_code.co_filename,
+                                   settings.BASE_DIR)
+            code = f'{path}:{frame.f_lineno}'
+        frame = frame.f_back
+    return ', '.join(place for place in (template, code) if place) or '?'
+
+
+class Shape:
+    def __init__(self, sql):
+        self.sql = sql
+        self.count = 0
+        self.duration = 0.0
+        self.origin = None
+
+    def __str__(self):
+        return (f'{self.count}x {self.sql} '
+                f'[{self.duration * 1000:.1f} ms] at {self.origin}')
+
+
+class QueryInspector:
+    """
+    execute_wrapper: меряет каждый запрос, медленные пишет в лог, а при
+    group=True ещё и считает формы.
+    """
+
+    def __init__(self, group=True, slow_ms=None):
+        self.group = group
+        self.slow = (settings.SLOW_QUERY_MS if slow_ms is None
+                     else slow_ms) / 1000
+        self.shapes = {}
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.queries += 1
+            if duration >= self.slow:
+                logger.warning('Slow query (%.1f ms) at %s: %s',
+                               duration * 1000, origin(), sql)
+            if self.group and _READ.match(sql):
+                self.add(sql, duration)
+
+    def add(self, sql, duration):
+        shape = normalize(sql)
+        if shape not in self.shapes:
+            self.shapes[shape] = Shape(shape)
+        shape = self.shapes[shape]
+        shape.count += 1
+        shape.duration += duration
+        # Откуда запрос, ищем только на первом повторе: он уже в цикле
+        if shape.count == 2:
+            shape.origin = origin()
+
+    def repeated(self, threshold=None):
+        """Формы, выполненные threshold и больше раз, частые первыми."""
+        if threshold is None:
+            threshold = settings.NPLUSONE_THRESHOLD
+        return sorted(
+            (shape for shape in self.shapes.values()
+             if shape.count >= threshold),
+            key=lambda shape: -shape.count,
+        )
+
+    def assert_no_repeats(self, threshold=None):
+        repeated = self.repeated(threshold)
+        if repeated:
+            raise AssertionError('N+1 queries:\n' + '\n'.join(
+                map(str, repeated)))
+
+
+@contextmanager
+def inspect_queries(group=True, slow_ms=None):
+    """Собирает запросы всех подключений внутри блока."""
+    inspector = QueryInspector(group, slow_ms)
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(inspector))
+        yield inspector
+
+
+class QueryInspectorMiddleware:
+    """Медленные запросы - всегда, N+1 - для выборки запросов."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sampled = random.random() < settings.QUERY_INSPECTOR_SAMPLE_RATE
+        with inspect_queries(group=sampled) as inspector:
+            response = self.get_response(request)
+        for shape in inspector.repeated():
+            logger.warning('N+1 in %s %s: %s', request.method,
+                           request.path, shape)
+        return response
@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -49,6 +51,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым: Server-Timing и гистограммы покрывают всю цепочку
+    'yatube.timing.TimingMiddleware',
+    # Журнал медленных запросов и поиск N+1, см. yatube/queries.py
+    'yatube.queries.QueryInspectorMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -64,7 +70,10 @@ TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, который отчитывается о времени рендера
+        'BACKEND': 'yatube.timing.TimedDjangoTemplates',
+        # Имя по умолчанию взялось бы из модуля бэкенда (timing)
+        'NAME': 'django',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -84,12 +93,93 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+# sqlite - файл в режиме WAL, для разработки и одного хоста;
+# postgresql - сервер из YATUBE_DB_*, нужен psycopg2
+# (requirements-postgresql.txt).
+# В продакшене: YATUBE_DB=postgresql
+DATABASE_ENGINE = os.environ.get('YATUBE_DB', 'sqlite')
+# internal - пул соединений в процессе, pgbouncer - пул снаружи
+DATABASE_POOL = os.environ.get('YATUBE_DB_POOL', 'internal')
+
+DATABASE_CONFIGS = {
+    'sqlite': {
+        'ENGINE': 'yatube.db_backends.sqlite3',
+        'NAME': os.environ.get('YATUBE_DB_NAME',
+                               os.path.join(BASE_DIR, 'db.sqlite3')),
+    },
+    'postgresql': {
+        'ENGINE': 'yatube.db_backends.postgresql',
+        'NAME': os.environ.get('YATUBE_DB_NAME', 'yatube'),
+        'USER': os.environ.get('YATUBE_DB_USER', ''),
+        'PASSWORD': os.environ.get('YATUBE_DB_PASSWORD', ''),
+        'HOST': os.environ.get('YATUBE_DB_HOST', ''),
+        'PORT': os.environ.get('YATUBE_DB_PORT', ''),
+        # Соединение живёт между запросами и проверяется перед первым
+        'CONN_MAX_AGE': int(os.environ.get('YATUBE_DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'connect_timeout': 5,
+        },
+    },
+}
+DATABASE_POOLS = ('internal', 'pgbouncer')
+if DATABASE_ENGINE not in DATABASE_CONFIGS:
+    raise ImproperlyConfigured(
+        f'YATUBE_DB={DATABASE_ENGINE!r} is not supported, '
+        f'use one of: {", ".join(DATABASE_CONFIGS)}')
+if DATABASE_POOL not in DATABASE_POOLS:
+    raise ImproperlyConfigured(
+        f'YATUBE_DB_POOL={DATABASE_POOL!r} is not supported, '
+        f'use one of: {", ".join(DATABASE_POOLS)}')
+DATABASES = {'default': DATABASE_CONFIGS[DATABASE_ENGINE]}
+
+if DATABASE_ENGINE == 'postgresql' and DATABASE_POOL == 'internal':
+    # Соединения держит пул, а поток отдаёт своё в конце запроса
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': 1,
+        'max_size': int(os.environ.get('YATUBE_DB_POOL_SIZE', 10)),
+        'timeout': 10,
     }
+elif DATABASE_ENGINE == 'postgresql':
+    # pgbouncer в режиме transaction не держит курсоры между транзакциями
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+
+# local - LRU в памяти процесса, shared - файловый кэш, общий для всех
+# воркеров и переживающий рестарт, tiered - local поверх shared.
+# В продакшене под gunicorn: YATUBE_CACHE=tiered
+CACHE_TIER = os.environ.get('YATUBE_CACHE', 'local')
+
+CACHES = {
+    'local': {
+        'BACKEND': 'yatube.cache_backends.LRUCache',
+        'LOCATION': 'yatube-local',
+        'OPTIONS': {
+            'MAX_SIZE': 64 * 1024 * 1024,
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('YATUBE_CACHE_DIR',
+                                   os.path.join(BASE_DIR, 'cache')),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+    'tiered': {
+        'BACKEND': 'yatube.cache_backends.TieredCache',
+        'OPTIONS': {
+            'LOCAL': 'local',
+            'SHARED': 'shared',
+            'LOCAL_TIMEOUT': 5,
+        },
+    },
 }
+CACHES['default'] = CACHES[CACHE_TIER]
 
 
 # Password validation
@@ -139,6 +229,25 @@ STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media') 
 
+# Загрузки всегда пишутся на диск кусками, см. posts/uploads.py
+FILE_UPLOAD_HANDLERS = ['posts.uploads.BoundedUploadHandler']
+UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+# Больше - отказ по заголовку, до декодирования
+IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+# Более крупные оригиналы уменьшаются при приёме
+IMAGE_MAX_SIDE = 2560
+
+# Посты авторов с большим числом подписчиков не раскладываются по лентам
+# подписок при публикации, а подмешиваются при чтении (posts/timeline.py)
+FANOUT_FOLLOWER_LIMIT = 10000
+# Потоки, в которых новый пост раскладывается по лентам подписчиков;
+# 0 - раскладывать сразу после коммита в потоке запроса
+FANOUT_WORKERS = int(os.environ.get('YATUBE_FANOUT_WORKERS', 1))
+
+# Потоки, в которых готовятся миниатюры картинок постов;
+# 0 - готовить сразу после коммита в потоке запроса
+THUMBNAIL_WORKERS = int(os.environ.get('YATUBE_THUMBNAIL_WORKERS', 2))
+
 # Login
 
 LOGIN_URL = '/auth/login/'
@@ -149,3 +258,25 @@ LOGOUT_REDIRECT_URL = 'index'
 EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
+
+# Сколько последних минут держат гистограммы на /admin/timings/
+TIMING_WINDOW = 10
+
+# Запросы дольше этого (мс) пишутся в лог yatube.queries
+SLOW_QUERY_MS = int(os.environ.get('YATUBE_SLOW_QUERY_MS', 200))
+# Одна форма запроса столько раз за запрос - это N+1
+NPLUSONE_THRESHOLD = 3
+# Доля запросов, в которых ищется N+1: в разработке все
+QUERY_INSPECTOR_SAMPLE_RATE = float(
+    os.environ.get('YATUBE_QUERY_SAMPLE_RATE', 1.0 if DEBUG else 0.01))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'yatube.queries': {'handlers': ['console'], 'level': 'WARNING'},
+    },
+}
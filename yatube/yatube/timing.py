@@ -0,0 +1,236 @@
+"""
+Замеры времени запросов.
+
+TimingMiddleware считает для каждого запроса SQL (число запросов и
+время), рендер шаблонов, нарезку миниатюр и время view. Итоги уходят
+в заголовок Server-Timing и в скользящие гистограммы по view, которые
+staff видит на /admin/timings/. Гистограммы живут в памяти процесса:
+у каждого воркера gunicorn свои.
+
+Накладные расходы - пара perf_counter() на SQL-запрос и шаблон и одна
+блокировка на запрос, поэтому замеры можно держать включёнными.
+"""
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from threading import Lock
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import connections
+from django.http import JsonResponse
+from django.template.backends.django import DjangoTemplates, Template
+
+# Границы корзин гистограммы, мс; последняя корзина - всё, что дольше
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+SLOT_SECONDS = 60
+
+_current = ContextVar('request_timings', default=None)
+
+
+class Timings:
+    """Накопитель одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.queries = 0
+        self.durations = {'sql': 0.0, 'template': 0.0, 'thumbnail': 0.0}
+        self.depth = dict.fromkeys(self.durations, 0)
+
+    def sql(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.durations['sql'] += time.perf_counter() - started
+            self.queries += 1
+
+
+@contextmanager
+def track(name):
+    """
+    Добавляет время блока к name текущего запроса. Вне запроса
+    (фоновые потоки, команды) ничего не делает.
+    """
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    # Вложенные блоки (шаблон внутри шаблона) не считаем дважды
+    timings.depth[name] += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.depth[name] -= 1
+        if not timings.depth[name]:
+            timings.durations[name] += time.perf_counter() - started
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        with track('template'):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Бэкенд DjangoTemplates, чьи шаблоны отчитываются в track()."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.requests = 0
+        self.total = 0.0
+        self.queries = 0
+        self.durations = {}
+
+    def add(self, total_ms, timings):
+        self.counts[bisect_left(BUCKETS, total_ms)] += 1
+        self.requests += 1
+        self.total += total_ms
+        self.queries += timings.queries
+        for name, duration in timings.durations.items():
+            self.durations[name] = (self.durations.get(name, 0.0)
+                                    + duration * 1000)
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.requests += other.requests
+        self.total += other.total
+        self.queries += other.queries
+        for name, duration in other.durations.items():
+            self.durations[name] = self.durations.get(name, 0.0) + duration
+
+    def percentile(self, fraction):
+        """Верхняя граница корзины, в которую попал процентиль."""
+        rank = fraction * self.requests
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return BUCKETS[index] if index < len(BUCKETS) else None
+        return None
+
+    def summary(self):
+        requests = self.requests or 1
+        return {
+            'requests': self.requests,
+            'p50_ms': self.percentile(0.50),
+            'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99),
+            'mean_ms': round(self.total / requests, 3),
+            'mean_queries': round(self.queries / requests, 2),
+            **{f'mean_{name}_ms': round(duration / requests, 3)
+               for name, duration in sorted(self.durations.items())},
+            'buckets': dict(zip([*map(str, BUCKETS), 'inf'], self.counts)),
+        }
+
+
+class RollingHistograms:
+    """
+    Гистограммы по view за последние TIMING_WINDOW минут: по корзине
+    на минуту, старые минуты выпадают из окна целиком.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.slots = deque()
+
+    def add(self, view_name, total_ms, timings):
+        slot = int(time.time() // SLOT_SECONDS)
+        with self.lock:
+            if not self.slots or self.slots[-1][0] != slot:
+                self.slots.append((slot, {}))
+                self._expire(slot)
+            views = self.slots[-1][1]
+            if view_name not in views:
+                views[view_name] = _Histogram()
+            views[view_name].add(total_ms, timings)
+
+    def _expire(self, slot):
+        window = getattr(settings, 'TIMING_WINDOW', 10)
+        while self.slots and self.slots[0][0] <= slot - window:
+            self.slots.popleft()
+
+    def snapshot(self):
+        with self.lock:
+            self._expire(int(time.time() // SLOT_SECONDS))
+            merged = {}
+            for _, views in self.slots:
+                for view_name, histogram in views.items():
+                    if view_name not in merged:
+                        merged[view_name] = _Histogram()
+                    merged[view_name].merge(histogram)
+        return {view_name: histogram.summary()
+                for view_name, histogram in sorted(merged.items())}
+
+    def clear(self):
+        with self.lock:
+            self.slots.clear()
+
+
+histograms = RollingHistograms()
+
+
+def _ms(seconds):
+    return f'{seconds * 1000:.1f}'
+
+
+class TimingMiddleware:
+    """Ставить первым в MIDDLEWARE, чтобы total покрывал всю цепочку."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = Timings()
+        token = _current.set(timings)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timings.sql))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        finished = time.perf_counter()
+        total = finished - timings.started
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            histograms.add(match.view_name, total * 1000, timings)
+        metrics = [f'total;dur={_ms(total)}']
+        if timings.view_started is not None:
+            view = finished - timings.view_started
+            metrics.append(f'view;dur={_ms(view)}')
+        metrics.append(f'sql;dur={_ms(timings.durations["sql"])};'
+                       f'desc="{timings.queries} queries"')
+        for name in ('template', 'thumbnail'):
+            if timings.durations[name]:
+                metrics.append(f'{name};dur={_ms(timings.durations[name])}')
+        response['Server-Timing'] = ', '.join(metrics)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = _current.get()
+        if timings is not None:
+            timings.view_started = time.perf_counter()
+
+
+@staff_member_required
+def timings_view(request):
+    """Скользящие гистограммы по view этого процесса."""
+    return JsonResponse({
+        'window_minutes': getattr(settings, 'TIMING_WINDOW', 10),
+        'views': histograms.snapshot(),
+    }, json_dumps_params={'ensure_ascii': False})